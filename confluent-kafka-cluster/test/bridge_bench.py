@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+"""
+kafka-to-otlp-bridge 离线基准测试
+
+不需要Kafka集群和collector: bridge代码直接从 deploy/kafka-consumer/kafka-to-otlp-bridge.yaml
+的ConfigMap加载 (与部署的代码完全相同)，通过bridge的 source_factory/session_factory 替换消息源和导出端:
+  消息源  内存中预生成的OTLP消息 (otlp_payloads)，或 --input 指定的NDJSON文件 (可为.gz)/replay_topics.py导出目录
+  导出端  本地子进程中的OTLP HTTP模拟服务 (可配置延迟和错误率)，
+          或 --sink null 的进程内空导出端 (不发请求，只测bridge自身开销，仅threads引擎)
+
+报告吞吐 (消息/秒、OTLP记录/秒)、每条消息的CPU时间和峰值内存。模拟服务在单独的进程中运行，
+不计入CPU时间。--output 保存结果，--baseline 与之前的结果对比，超过 --max-regression 时以非0状态退出。
+
+用法:
+  python bridge_bench.py --messages 20000 --latency-ms 5 --error-rate 0.01
+  python bridge_bench.py --sink null --encoding otlp_proto --output baseline.json
+  python bridge_bench.py --sink null --encoding otlp_proto --baseline baseline.json --max-regression 0.1
+  python bridge_bench.py --env BRIDGE_COMPRESSION=gzip --env BRIDGE_LANES_PER_TOPIC=6
+
+NDJSON输入每行一条Kafka消息: {"topic": ..., "partition": ..., "value": "文本"} 或以 "value_b64" 给出二进制内容
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import types
+import base64
+import random
+import asyncio
+import logging
+import argparse
+import resource
+import threading
+import multiprocessing
+from collections import namedtuple, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from kafka import TopicPartition
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+try:
+    from aiokafka.util import commit_structure_validate
+except ImportError:
+    commit_structure_validate = None
+
+from otlp_payloads import ENCODINGS, PayloadGenerator
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BRIDGE_YAML = os.path.join(os.path.dirname(SCRIPT_DIR), 'deploy/kafka-consumer/kafka-to-otlp-bridge.yaml')
+
+# 导出完成后等待offset全部提交的最长时间(秒)
+COMMIT_CHECK_TIMEOUT_S = 10
+
+BENCH_TOPICS = {'otcol_logs': 'logs', 'otcol_metrics': 'metrics', 'otcol_traces': 'traces'}
+
+# 与bridge用到的ConsumerRecord字段一致
+BenchRecord = namedtuple('BenchRecord', ['topic', 'partition', 'offset', 'timestamp', 'value'])
+
+def load_bridge(path=BRIDGE_YAML, engine='threads'):
+    """
+    从ConfigMap加载 bridge.py (asyncio引擎时还有 bridge_async.py) 并注册为同名模块。
+    bridge在导入时读取环境变量，因此需要在调用前设置好 BRIDGE_* 配置
+    """
+    with open(path) as f:
+        sources = {}
+        for document in yaml.safe_load_all(f):
+            if document and document.get('kind') == 'ConfigMap':
+                sources.update(document.get('data', {}))
+
+    filenames = ['bridge.py'] + (['bridge_async.py'] if engine == 'asyncio' else [])
+    for filename in filenames:
+        name = filename[:-3]
+        module = types.ModuleType(name)
+        module.__file__ = f'{path}:{filename}'
+        sys.modules[name] = module
+        exec(compile(sources[filename], module.__file__, 'exec'), module.__dict__)
+
+    # bridge导入时把根日志配置为INFO，基准测试只需要警告以上
+    logging.getLogger().setLevel(logging.WARNING)
+    return sys.modules['bridge']
+
+class MemorySource:
+    """
+    内存消息源，实现bridge使用的KafkaConsumer接口子集。
+    分区在subscribe时全部分配，已提交offset到达分区末尾即视为处理完成
+    """
+
+    def __init__(self, topic, partitions):
+        self.topic = topic
+        # TopicPartition -> [BenchRecord]
+        self.data = {TopicPartition(topic, p): records for p, records in partitions.items()}
+        self.positions = {tp: 0 for tp in self.data}
+        self.committed = {}
+        self.paused = set()
+        self.total = sum(len(records) for records in self.data.values())
+
+    def subscribe(self, topics, listener=None):
+        if listener is not None:
+            listener.on_partitions_assigned(set(self.data))
+
+    def take(self, max_records):
+        """按分区轮流取出最多max_records条消息，跳过暂停的分区"""
+        out = {}
+        remaining = max_records
+        for tp, records in self.data.items():
+            position = self.positions[tp]
+            if tp in self.paused or position >= len(records) or remaining <= 0:
+                continue
+            batch = records[position:position + remaining]
+            self.positions[tp] = position + len(batch)
+            remaining -= len(batch)
+            out[tp] = batch
+        return out
+
+    def poll(self, timeout_ms=0, max_records=500):
+        records = self.take(max_records)
+        if not records:
+            time.sleep(timeout_ms / 1000)
+        return records
+
+    def pause(self, *tps):
+        self.paused.update(tps)
+
+    def resume(self, *tps):
+        self.paused.difference_update(tps)
+
+    def commit(self, offsets=None):
+        for tp, offset in (offsets or {}).items():
+            self.committed[tp] = getattr(offset, 'offset', offset)
+
+    def commit_async(self, offsets=None, callback=None):
+        self.commit(offsets)
+        if callback is not None:
+            callback(offsets, None)
+
+    def close(self):
+        pass
+
+    def completed(self):
+        return sum(self.committed.get(tp, 0) for tp in self.data)
+
+    def done(self):
+        return self.completed() >= self.total
+
+class AsyncMemorySource:
+    """MemorySource的AIOKafkaConsumer接口包装，供asyncio引擎使用"""
+
+    def __init__(self, source):
+        self.source = source
+        self.listener = None
+
+    def subscribe(self, topics, listener=None):
+        self.listener = listener
+
+    async def start(self):
+        if self.listener is not None:
+            await self.listener.on_partitions_assigned(set(self.source.data))
+
+    async def stop(self):
+        pass
+
+    async def getmany(self, timeout_ms=0, max_records=500):
+        records = self.source.take(max_records)
+        if not records:
+            await asyncio.sleep(timeout_ms / 1000)
+        return records
+
+    async def commit(self, offsets):
+        # 与AIOKafkaConsumer.commit相同的参数校验，key类型不对时在压测中直接报错
+        offsets = commit_structure_validate(offsets)
+        self.source.commit(offsets)
+
+    def pause(self, *tps):
+        self.source.pause(*tps)
+
+    def resume(self, *tps):
+        self.source.resume(*tps)
+
+def generate_messages(args):
+    """按topic生成消息: 每个topic --messages 条，平均分到 --partitions 个分区。返回 ({topic: {分区: [消息]}}, 每条消息的记录数)"""
+    timestamp_ms = int(time.time() * 1000)
+    topics = {}
+    records_per_message = 1
+    for index, (topic, signal) in enumerate(BENCH_TOPICS.items()):
+        if args.encoding == 'text':
+            values = [f"plain text message {i} from {topic}".encode() for i in range(args.variants)]
+            generate = lambda i, values=values: values[i % len(values)]
+        else:
+            generator = PayloadGenerator(
+                signal, args.encoding, args.resources, args.records, args.body_size,
+                cardinality=args.cardinality, seed=index
+            )
+            records_per_message = generator.records_per_payload
+            values = [generator.next() for _ in range(args.variants)]
+            generate = lambda i, values=values: values[i % len(values)]
+
+        partitions = defaultdict(list)
+        for i in range(args.messages):
+            partition = i % args.partitions
+            offset = len(partitions[partition])
+            partitions[partition].append(BenchRecord(topic, partition, offset, timestamp_ms, generate(i)))
+        topics[topic] = partitions
+    return topics, records_per_message
+
+def load_messages(path):
+    """
+    读取NDJSON (或.gz) 消息文件，或 replay_topics.py export 的ndjson导出目录。
+    offset按文件内顺序在每个分区内重新编号
+    """
+    if os.path.isdir(path):
+        paths = sorted(os.path.join(path, name) for name in os.listdir(path) if '.ndjson' in name)
+    else:
+        paths = [path]
+
+    topics = defaultdict(lambda: defaultdict(list))
+    for filename in paths:
+        opener = gzip.open if filename.endswith('.gz') else open
+        with opener(filename, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if 'value_b64' in entry:
+                    value = base64.b64decode(entry['value_b64'])
+                else:
+                    value = entry['value'].encode('utf-8')
+                partitions = topics[entry['topic']]
+                partition = int(entry.get('partition', 0))
+                offset = len(partitions[partition])
+                partitions[partition].append(
+                    BenchRecord(entry['topic'], partition, offset, int(entry.get('timestamp', 0)), value)
+                )
+    return topics
+
+def serve_otlp(port, latency_ms, error_rate, counters, ready):
+    """OTLP HTTP模拟服务 (子进程): 按延迟响应，按错误率返回503。counters: 请求数、请求字节、错误数"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            failed = random.random() < error_rate
+            with counters.get_lock():
+                counters[0] += 1
+                counters[1] += len(body)
+                counters[2] += failed
+
+            self.send_response(503 if failed else 200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'{}')
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    port.value = server.server_address[1]
+    ready.set()
+    server.serve_forever()
+
+class NullResponse:
+    status_code = 200
+    text = '{}'
+
+class NullSession:
+    """进程内的空导出端 (requests.Session接口): 不发网络请求，直接返回200"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = [0, 0, 0]
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        with self.lock:
+            self.counters[0] += 1
+            self.counters[1] += len(data)
+        return NullResponse
+
+def peak_rss_mb():
+    # Linux下ru_maxrss的单位是KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def forwarded_count(bridge):
+    """bridge已导出 (包括写入溢出队列和被collector明确拒绝而丢弃) 的消息数"""
+    with bridge.METRICS.lock:
+        return sum(value for (name, _), value in bridge.METRICS.counters.items()
+                   if name == 'bridge_records_forwarded_total')
+
+def run_bench(bridge, sources, args, session_factory):
+    """
+    运行bridge直到所有消息都已导出或超时，此时停止计时。offset提交按 BRIDGE_COMMIT_INTERVAL_MS 间隔进行，
+    不计入耗时: 停止计时后把提交间隔改为0强制提交，只用于确认offset全部提交。
+    返回 (已导出消息数, offset是否全部提交, 耗时, CPU秒, 峰值内存MB, 内存增长MB)
+    """
+    total = sum(source.total for source in sources.values())
+    stop = threading.Event()
+    topics = list(sources)
+    if args.engine == 'asyncio':
+        import bridge_async
+        target = lambda: asyncio.run(bridge_async.run(
+            topics, lambda topic: AsyncMemorySource(sources[topic]), stop
+        ))
+    else:
+        target = lambda: bridge.run_bridge(topics, sources.get, session_factory, stop)
+
+    rss_before = peak_rss_mb()
+    cpu_before = time.process_time()
+    started = time.perf_counter()
+    threading.Thread(target=target, name='bridge', daemon=True).start()
+
+    deadline = started + args.timeout
+    while forwarded_count(bridge) < total and time.perf_counter() < deadline:
+        time.sleep(0.002)
+
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_before
+    rss = peak_rss_mb()
+    forwarded = forwarded_count(bridge)
+
+    bridge.COMMIT_INTERVAL_MS = 0
+    commit_deadline = time.perf_counter() + COMMIT_CHECK_TIMEOUT_S
+    while not all(source.done() for source in sources.values()) and time.perf_counter() < commit_deadline:
+        time.sleep(0.01)
+    stop.set()
+    committed = all(source.done() for source in sources.values())
+    return forwarded, committed, elapsed, cpu, rss, rss - rss_before
+
+def summarize_metrics(bridge):
+    """从bridge指标中提取导出请求数、失败数、合并和压缩比例"""
+    totals = defaultdict(float)
+    for (name, labels), value in bridge.METRICS.snapshot().items():
+        labels = dict(labels)
+        if name == 'bridge_exports_total':
+            totals['exports'] += value
+            if labels.get('status') != '200':
+                totals['export_failures'] += value
+        elif name in ('bridge_merge_input_bytes_total', 'bridge_merge_output_bytes_total',
+                      'bridge_compression_input_bytes_total', 'bridge_compression_output_bytes_total',
+                      'bridge_compression_cpu_seconds_total', 'bridge_export_retries_total'):
+            totals[name] += value
+    return totals
+
+def print_report(result):
+    print(f"\n📊 基准测试结果 ({result['engine']} 引擎, 导出端: {result['sink']})")
+    print(f"  消息: {result['completed']}/{result['messages']}，耗时 {result['elapsed_s']:.2f}s，"
+          f"offset提交: {'✅' if result['committed'] else '❌'}")
+    print(f"  吞吐: {result['messages_per_s']:,.0f} 消息/s, {result['records_per_s']:,.0f} OTLP记录/s")
+    print(f"  CPU: {result['cpu_s']:.2f}s, {result['cpu_us_per_message']:.1f}µs/消息 "
+          f"({result['cpu_s'] / result['elapsed_s'] * 100:.0f}% 单核)")
+    print(f"  内存: 峰值RSS {result['peak_rss_mb']:.1f}MB，运行期间增长 {result['rss_growth_mb']:.1f}MB")
+    print(f"  导出请求: {result['exports']:.0f} (失败 {result['export_failures']:.0f}, 重试 {result['retries']:.0f})，"
+          f"请求体 {result['request_bytes'] / 1024 / 1024:.1f}MB")
+    if result['merge_ratio']:
+        print(f"  信封合并比例: {result['merge_ratio']:.2f}")
+    if result['compression_ratio']:
+        print(f"  压缩比例: {result['compression_ratio']:.2f}，压缩CPU {result['compression_cpu_s']:.2f}s")
+
+def check_regression(result, baseline_path, max_regression):
+    """与基线对比吞吐和每条消息的CPU时间，返回是否通过"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    ok = True
+    print(f"\n📏 与基线对比: {baseline_path} (允许回退 {max_regression * 100:.0f}%)")
+    for key, higher_is_better in (('messages_per_s', True), ('cpu_us_per_message', False)):
+        before, after = baseline[key], result[key]
+        change = (after - before) / before if before else 0.0
+        regressed = change < -max_regression if higher_is_better else change > max_regression
+        ok = ok and not regressed
+        print(f"  {'❌' if regressed else '✅'} {key}: {before:,.1f} -> {after:,.1f} ({change * 100:+.1f}%)")
+    return ok
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='kafka-to-otlp-bridge 离线基准测试')
+    parser.add_argument('--engine', choices=['threads', 'asyncio'], default='threads', help='bridge引擎 (默认: threads)')
+    parser.add_argument('--sink', choices=['http', 'null'], default='http',
+                        help='导出端: http (本地模拟OTLP服务) 或 null (进程内空导出端) (默认: http)')
+    parser.add_argument('--bridge-yaml', default=BRIDGE_YAML, help='bridge的部署文件 (从其中的ConfigMap加载代码)')
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='传给bridge的配置，如 BRIDGE_COMPRESSION=gzip (可重复)')
+    parser.add_argument('--timeout', type=float, default=300, help='最长运行时间(秒) (默认: 300)')
+
+    source = parser.add_argument_group('消息源')
+    source.add_argument('--input', help='NDJSON消息文件 (可为.gz) 或 replay_topics.py 的导出目录，不指定时按以下参数生成')
+    source.add_argument('--messages', type=int, default=20000, help='每个topic的消息数 (默认: 20000)')
+    source.add_argument('--partitions', type=int, default=6, help='每个topic的分区数 (默认: 6)')
+    source.add_argument('--encoding', choices=ENCODINGS + ('text',), default='json',
+                        help='消息编码，text为非OTLP内容 (走包装路径) (默认: json)')
+    source.add_argument('--resources', type=int, default=1, help='每条消息的resource数 (默认: 1)')
+    source.add_argument('--records', type=int, default=1, help='每个resource的记录数 (默认: 1)')
+    source.add_argument('--body-size', type=int, default=64, help='日志body/span消息长度 (默认: 64)')
+    source.add_argument('--cardinality', type=int, default=10, help='每个属性的取值个数 (默认: 10)')
+    source.add_argument('--variants', type=int, default=64, help='预生成的不同消息数，循环使用 (默认: 64)')
+
+    sink = parser.add_argument_group('模拟OTLP服务')
+    sink.add_argument('--latency-ms', type=float, default=0, help='每个请求的响应延迟(毫秒) (默认: 0)')
+    sink.add_argument('--error-rate', type=float, default=0, help='返回503的比例 (默认: 0)')
+
+    output = parser.add_argument_group('结果')
+    output.add_argument('--output', help='把结果写入该JSON文件 (可作为之后的 --baseline)')
+    output.add_argument('--baseline', help='与之前 --output 的结果对比')
+    output.add_argument('--max-regression', type=float, default=0.1, help='允许的性能回退比例 (默认: 0.1)')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if yaml is None:
+        print("❌ 需要pyyaml: pip install pyyaml")
+        sys.exit(1)
+    if args.sink == 'null' and args.engine == 'asyncio':
+        print("❌ null导出端只支持threads引擎")
+        sys.exit(1)
+
+    print("🚀 kafka-to-otlp-bridge 离线基准测试")
+
+    server = None
+    counters = None
+    if args.sink == 'http':
+        ctx = multiprocessing.get_context('spawn')
+        counters = ctx.Array('q', 3)
+        port = ctx.Value('i', 0)
+        ready = ctx.Event()
+        server = ctx.Process(
+            target=serve_otlp, args=(port, args.latency_ms, args.error_rate, counters, ready), daemon=True
+        )
+        server.start()
+        ready.wait(10)
+        base_url = f'http://127.0.0.1:{port.value}'
+        print(f"🌐 模拟OTLP服务: {base_url} (延迟 {args.latency_ms:g}ms, 错误率 {args.error_rate:g})")
+        os.environ['BRIDGE_OTLP_BASE_URL'] = base_url
+
+    # 基准测试不使用磁盘溢出队列和指标端口
+    os.environ['BRIDGE_SPILL_DIR'] = ''
+    for item in args.env:
+        key, _, value = item.partition('=')
+        os.environ[key] = value
+    bridge = load_bridge(args.bridge_yaml, args.engine)
+
+    if args.input:
+        topics = load_messages(args.input)
+        records_per_message = 1
+    else:
+        topics, records_per_message = generate_messages(args)
+    sources = {topic: MemorySource(topic, partitions) for topic, partitions in topics.items()}
+    total = sum(source.total for source in sources.values())
+    print(f"📦 消息源: {len(sources)} 个topic，共 {total} 条消息 ({records_per_message} 条OTLP记录/消息)")
+
+    null_session = NullSession() if args.sink == 'null' else None
+    session_factory = (lambda topic, pool_size: null_session) if null_session else None
+
+    completed, committed, elapsed, cpu, rss, rss_growth = run_bench(bridge, sources, args, session_factory)
+    metrics = summarize_metrics(bridge)
+    request_counters = null_session.counters if null_session else counters
+
+    merge_out = metrics['bridge_merge_output_bytes_total']
+    compression_out = metrics['bridge_compression_output_bytes_total']
+    result = {
+        'engine': args.engine,
+        'sink': args.sink,
+        'encoding': args.encoding if not args.input else 'input',
+        'messages': total,
+        'completed': completed,
+        'committed': committed,
+        'elapsed_s': elapsed,
+        'messages_per_s': completed / elapsed,
+        'records_per_s': completed * records_per_message / elapsed,
+        'cpu_s': cpu,
+        'cpu_us_per_message': cpu / completed * 1e6 if completed else 0.0,
+        'peak_rss_mb': rss,
+        'rss_growth_mb': rss_growth,
+        'exports': metrics['exports'],
+        'export_failures': metrics['export_failures'],
+        'retries': metrics['bridge_export_retries_total'],
+        'request_bytes': request_counters[1],
+        'merge_ratio': metrics['bridge_merge_input_bytes_total'] / merge_out if merge_out else 0.0,
+        'compression_ratio': metrics['bridge_compression_input_bytes_total'] / compression_out if compression_out else 0.0,
+        'compression_cpu_s': metrics['bridge_compression_cpu_seconds_total'],
+        'bridge_env': dict(item.partition('=')[::2] for item in args.env),
+    }
+    print_report(result)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"💾 结果已写入: {args.output}")
+
+    ok = completed >= total and committed
+    if completed < total:
+        print(f"❌ {args.timeout:g}s 内未处理完全部消息")
+    elif not committed:
+        print("❌ 消息已全部导出，但offset没有全部提交")
+    if args.baseline:
+        ok = check_regression(result, args.baseline, args.max_regression) and ok
+
+    if server is not None:
+        server.terminate()
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
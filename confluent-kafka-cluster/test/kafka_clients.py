@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Kafka客户端共享模块 - 供 manage_topics.py 和 local_kafka_test.py 使用
+
+SSL上下文只加载一次，admin/producer/consumer按client_id缓存复用，集群元数据按TTL缓存，
+避免每个操作都重新进行一次完整的mTLS握手和元数据引导。
+所有连接建立的耗时记录在 PROFILER 中，脚本通过 --profile 打印
+"""
+
+import os
+import ssl
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+from kafka import KafkaProducer, KafkaConsumer
+from kafka.admin import KafkaAdminClient
+
+# Kafka外部IP地址和端口映射
+KAFKA_BROKERS = [
+    '35.197.206.204:9093',   # kafka-0-internal
+    '34.147.221.36:9093',    # kafka-1-internal
+    '34.39.39.253:9093'      # kafka-2-internal
+]
+
+# 证书文件路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+
+CERT_FILES = {
+    'ca_cert': os.path.join(PROJECT_ROOT, 'deploy/certs/ca-cert.pem'),
+    'client_cert': os.path.join(PROJECT_ROOT, 'deploy/certs/kafka-client-cert.pem'),
+    'client_key': os.path.join(PROJECT_ROOT, 'deploy/certs/kafka-client-key.pem')
+}
+
+API_VERSION = (2, 6, 0)
+REQUEST_TIMEOUT_MS = 30000
+
+# 集群元数据缓存时间(秒)
+METADATA_TTL_S = float(os.environ.get('KAFKA_METADATA_TTL_S', '30'))
+
+class Profiler:
+    """记录连接建立(SSL加载、客户端创建、元数据拉取)的次数和耗时，其余时间视为实际工作"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.steps = {}
+        self.cache_hits = {}
+
+    @contextmanager
+    def setup(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                count, total = self.steps.get(name, (0, 0.0))
+                self.steps[name] = (count + 1, total + elapsed)
+
+    def hit(self, name):
+        with self.lock:
+            self.cache_hits[name] = self.cache_hits.get(name, 0) + 1
+
+    def report(self):
+        total = time.perf_counter() - self.started
+        setup = sum(seconds for _, seconds in self.steps.values())
+
+        print(f"\n⏱️ 连接耗时分析 (总耗时: {total:.2f}s)")
+        print(f"  {'步骤':<30} {'次数':>6} {'耗时':>10} {'缓存命中':>10}")
+        for name in sorted(self.steps):
+            count, seconds = self.steps[name]
+            print(f"  {name:<30} {count:>6} {seconds * 1000:>8.1f}ms {self.cache_hits.get(name, 0):>10}")
+
+        work = max(total - setup, 0.0)
+        share = setup / total * 100 if total else 0.0
+        print(f"  连接建立合计: {setup:.2f}s ({share:.1f}%)，实际工作: {work:.2f}s ({100 - share:.1f}%)")
+
+PROFILER = Profiler()
+
+_lock = threading.RLock()
+_ssl_context = None
+_clients = {}
+_metadata = None
+_metadata_time = 0.0
+
+def check_cert_files(verbose=True):
+    """检查证书文件是否存在"""
+    ok = True
+    for name, path in CERT_FILES.items():
+        if not os.path.exists(path):
+            print(f"❌ 证书文件不存在: {name} -> {path}")
+            ok = False
+        elif verbose:
+            print(f"✅ 证书文件存在: {name} -> {path}")
+    return ok
+
+def get_ssl_context():
+    """返回共享的SSL上下文，证书只在第一次调用时加载"""
+    global _ssl_context
+    with _lock:
+        if _ssl_context is not None:
+            PROFILER.hit('ssl_context')
+            return _ssl_context
+
+        if not check_cert_files(verbose=False):
+            raise FileNotFoundError("证书文件缺失")
+
+        with PROFILER.setup('ssl_context'):
+            context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
+            context.check_hostname = False  # 跳过主机名验证，因为使用IP地址
+            context.verify_mode = ssl.CERT_REQUIRED
+            context.load_verify_locations(CERT_FILES['ca_cert'])
+            context.load_cert_chain(CERT_FILES['client_cert'], CERT_FILES['client_key'])
+        _ssl_context = context
+        return context
+
+def _get_client(kind, client_id, factory):
+    """按 (类型, client_id) 缓存客户端，同一client_id第二次调用时直接返回已有实例"""
+    key = (kind, client_id)
+    with _lock:
+        client = _clients.get(key)
+        if client is not None:
+            PROFILER.hit(f'{kind}:{client_id}')
+            return client
+
+        ssl_context = get_ssl_context()
+        with PROFILER.setup(f'{kind}:{client_id}'):
+            client = factory(ssl_context)
+        _clients[key] = client
+        return client
+
+def get_admin(client_id='topic-manager'):
+    """返回缓存的Kafka管理客户端"""
+    return _get_client('admin', client_id, lambda ssl_context: KafkaAdminClient(
+        bootstrap_servers=KAFKA_BROKERS,
+        security_protocol='SSL',
+        ssl_context=ssl_context,
+        client_id=client_id,
+        api_version=API_VERSION,
+        request_timeout_ms=REQUEST_TIMEOUT_MS
+    ))
+
+def create_producer(client_id='local-test-producer', warm_topics=(), bootstrap_servers=None, **config):
+    """
+    创建一个新的(不缓存的)Kafka生产者，用于需要不同配置的场景 (如参数对比测试)。
+    bootstrap_servers 指定时以明文连接该地址 (本地测试broker)，否则通过mTLS连接集群；
+    warm_topics 会预先拉取这些topic的元数据，使首条消息的延迟不包含连接建立
+    """
+    if bootstrap_servers:
+        connection = {'bootstrap_servers': bootstrap_servers, 'security_protocol': 'PLAINTEXT'}
+    else:
+        connection = {'bootstrap_servers': KAFKA_BROKERS, 'security_protocol': 'SSL', 'ssl_context': get_ssl_context()}
+
+    with PROFILER.setup(f'producer:{client_id}'):
+        producer = KafkaProducer(
+            client_id=client_id,
+            api_version=API_VERSION,
+            request_timeout_ms=REQUEST_TIMEOUT_MS,
+            **connection,
+            **config
+        )
+        for topic in warm_topics:
+            producer.partitions_for(topic)
+    return producer
+
+def get_producer(client_id='local-test-producer', warm_topics=(), **config):
+    """返回缓存的Kafka生产者，config只在第一次创建时生效"""
+    key = ('producer', client_id)
+    with _lock:
+        producer = _clients.get(key)
+        if producer is not None:
+            PROFILER.hit(f'producer:{client_id}')
+            return producer
+
+        producer = _clients[key] = create_producer(client_id, warm_topics, **config)
+        return producer
+
+def get_consumer(client_id='local-test-consumer', **config):
+    """返回缓存的Kafka消费者 (不订阅topic，由调用方assign/subscribe)"""
+    return _get_client('consumer', client_id, lambda ssl_context: KafkaConsumer(
+        bootstrap_servers=KAFKA_BROKERS,
+        security_protocol='SSL',
+        ssl_context=ssl_context,
+        client_id=client_id,
+        api_version=API_VERSION,
+        request_timeout_ms=REQUEST_TIMEOUT_MS,
+        **config
+    ))
+
+def create_consumer(client_id='local-test-consumer', bootstrap_servers=None, **config):
+    """
+    创建一个新的(不缓存的)Kafka消费者，用于并行读取等每个线程需要独立连接的场景。
+    bootstrap_servers 指定时以明文连接该地址 (本地测试broker)，否则通过mTLS连接集群
+    """
+    if bootstrap_servers:
+        connection = {'bootstrap_servers': bootstrap_servers, 'security_protocol': 'PLAINTEXT'}
+    else:
+        connection = {'bootstrap_servers': KAFKA_BROKERS, 'security_protocol': 'SSL', 'ssl_context': get_ssl_context()}
+
+    with PROFILER.setup(f'consumer:{client_id}'):
+        return KafkaConsumer(
+            client_id=client_id,
+            api_version=API_VERSION,
+            request_timeout_ms=REQUEST_TIMEOUT_MS,
+            **connection,
+            **config
+        )
+
+def get_group_offsets(group_id):
+    """返回消费组已提交的offsets {TopicPartition: OffsetAndMetadata}"""
+    admin = get_admin()
+    # kafka-python 3.x 用按消费组批量查询的 list_group_offsets 代替了 list_consumer_group_offsets
+    if hasattr(admin, 'list_consumer_group_offsets'):
+        return admin.list_consumer_group_offsets(group_id)
+    return admin.list_group_offsets([group_id]).get(group_id, {})
+
+def _normalize_partition(partition):
+    # kafka-python 2.x 与 3.x 的元数据字段名不同
+    return {
+        'partition': partition.get('partition', partition.get('partition_index')),
+        'leader': partition.get('leader', partition.get('leader_id')),
+        'replicas': list(partition.get('replicas', partition.get('replica_nodes')) or []),
+        'isr': list(partition.get('isr', partition.get('isr_nodes')) or [])
+    }
+
+def get_topic_metadata(refresh=False):
+    """
+    返回 {topic: [分区信息]} (包含内部topics)，分区信息为 partition/leader/replicas/isr。
+    结果缓存 METADATA_TTL_S 秒，所有topic通过一次元数据请求获取
+    """
+    global _metadata, _metadata_time
+    with _lock:
+        if not refresh and _metadata is not None and time.monotonic() - _metadata_time < METADATA_TTL_S:
+            PROFILER.hit('metadata')
+            return _metadata
+
+        admin = get_admin()
+        with PROFILER.setup('metadata'):
+            topics = admin.describe_topics()
+
+        metadata = {}
+        for topic in topics:
+            name = topic.get('topic', topic.get('name'))
+            partitions = [_normalize_partition(p) for p in topic.get('partitions', [])]
+            metadata[name] = sorted(partitions, key=lambda p: p['partition'])
+
+        _metadata = metadata
+        _metadata_time = time.monotonic()
+        return metadata
+
+def get_topic_partitions(topic):
+    """返回topic的分区号集合，topic不存在时返回空集合"""
+    return {p['partition'] for p in get_topic_metadata().get(topic, [])}
+
+def invalidate_metadata():
+    """创建/删除topic后调用，下次读取时重新拉取元数据"""
+    global _metadata
+    with _lock:
+        _metadata = None
+
+def close_all():
+    """关闭所有缓存的客户端 (进程退出时自动调用)"""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+
+    for client in clients:
+        try:
+            client.close()
+        except Exception:
+            pass
+
+atexit.register(close_all)
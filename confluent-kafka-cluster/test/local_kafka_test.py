@@ -4,65 +4,40 @@
 使用外部IP地址和mTLS连接到Kafka集群
 """
 
+import csv
 import json
 import time
 import sys
+import itertools
+import math
+import signal
 import base64
+import argparse
+import functools
+import threading
+import multiprocessing
 from datetime import datetime
-from kafka import KafkaProducer, KafkaConsumer
-from kafka.admin import KafkaAdminClient, NewTopic
+from collections import namedtuple
+from kafka import TopicPartition
+from kafka.admin import NewTopic
 from kafka.errors import KafkaError, TopicAlreadyExistsError
-import ssl
 
-# Kafka外部IP地址和端口映射
-KAFKA_BROKERS = [
-    '35.197.206.204:9093',   # kafka-0-internal
-    '34.147.221.36:9093',    # kafka-1-internal  
-    '34.39.39.253:9093'      # kafka-2-internal
-]
+from kafka_clients import (
+    KAFKA_BROKERS, PROFILER, check_cert_files, get_admin, get_producer, get_consumer, create_producer,
+    get_topic_metadata, invalidate_metadata, close_all
+)
+from otlp_payloads import ENCODINGS, PayloadGenerator, new_stamp, stamp_attributes
 
-# 证书文件路径
-import os
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+# 回读验证的最长等待时间(秒)
+VERIFY_TIMEOUT_S = 15
 
-CERT_FILES = {
-    'ca_cert': os.path.join(PROJECT_ROOT, 'deploy/certs/ca-cert.pem'),
-    'client_cert': os.path.join(PROJECT_ROOT, 'deploy/certs/kafka-client-cert.pem'),
-    'client_key': os.path.join(PROJECT_ROOT, 'deploy/certs/kafka-client-key.pem')
-}
+# 一条已确认的测试消息: 写入位置、原始字节、发送开始和收到ack的时间 (perf_counter)
+SentMessage = namedtuple('SentMessage', ['topic', 'partition', 'offset', 'value', 'sent_at', 'acked_at'])
 
-def check_cert_files():
-    """检查证书文件是否存在"""
-    for name, path in CERT_FILES.items():
-        if not os.path.exists(path):
-            print(f"❌ 证书文件不存在: {name} -> {path}")
-            return False
-        else:
-            print(f"✅ 证书文件存在: {name} -> {path}")
-    return True
-
-def create_ssl_context():
-    """创建SSL上下文"""
-    # 首先检查证书文件
-    if not check_cert_files():
-        raise FileNotFoundError("证书文件缺失")
-    
-    context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
-    context.check_hostname = False  # 跳过主机名验证，因为使用IP地址
-    context.verify_mode = ssl.CERT_REQUIRED
-    
-    # 加载CA证书
-    context.load_verify_locations(CERT_FILES['ca_cert'])
-    
-    # 加载客户端证书和私钥
-    context.load_cert_chain(CERT_FILES['client_cert'], CERT_FILES['client_key'])
-    
-    return context
-
-def create_simple_log_message():
-    """创建简单的OTLP日志消息"""
-    timestamp_ns = int(time.time() * 1_000_000_000)
+def create_simple_log_message(stamp=None):
+    """创建简单的OTLP日志消息 (带延迟打点)"""
+    stamp = stamp or new_stamp()
+    timestamp_ns = stamp.sent_unix_nano
     
     message = {
         "resourceLogs": [{
@@ -77,7 +52,8 @@ def create_simple_log_message():
                 "logRecords": [{
                     "timeUnixNano": str(timestamp_ns),
                     "severityText": "INFO",
-                    "body": {"stringValue": f"本地测试日志 - {datetime.now().isoformat()}"}
+                    "body": {"stringValue": f"本地测试日志 - {datetime.now().isoformat()}"},
+                    "attributes": stamp_attributes(stamp)
                 }]
             }]
         }]
@@ -85,9 +61,10 @@ def create_simple_log_message():
     
     return json.dumps(message, ensure_ascii=False)
 
-def create_simple_metrics_message():
-    """创建简单的OTLP指标消息"""
-    timestamp_ns = int(time.time() * 1_000_000_000)
+def create_simple_metrics_message(stamp=None):
+    """创建简单的OTLP指标消息 (带延迟打点)"""
+    stamp = stamp or new_stamp()
+    timestamp_ns = stamp.sent_unix_nano
     
     message = {
         "resourceMetrics": [{
@@ -104,7 +81,8 @@ def create_simple_metrics_message():
                     "sum": {
                         "dataPoints": [{
                             "timeUnixNano": str(timestamp_ns),
-                            "asInt": "42"
+                            "asInt": "42",
+                            "attributes": stamp_attributes(stamp)
                         }]
                     }
                 }]
@@ -114,9 +92,10 @@ def create_simple_metrics_message():
     
     return json.dumps(message, ensure_ascii=False)
 
-def create_simple_trace_message():
-    """创建简单的OTLP追踪消息"""
-    timestamp_ns = int(time.time() * 1_000_000_000)
+def create_simple_trace_message(stamp=None):
+    """创建简单的OTLP追踪消息 (带延迟打点)"""
+    stamp = stamp or new_stamp()
+    timestamp_ns = stamp.sent_unix_nano
     
     message = {
         "resourceSpans": [{
@@ -133,7 +112,8 @@ def create_simple_trace_message():
                     "spanId": base64.b64encode(b"12345678").decode(),
                     "name": "local-test-span",
                     "startTimeUnixNano": str(timestamp_ns),
-                    "endTimeUnixNano": str(timestamp_ns + 1000000)
+                    "endTimeUnixNano": str(timestamp_ns + 1000000),
+                    "attributes": stamp_attributes(stamp)
                 }]
             }]
         }]
@@ -141,20 +121,32 @@ def create_simple_trace_message():
     
     return json.dumps(message, ensure_ascii=False)
 
-def create_admin_client():
-    """创建Kafka管理客户端"""
-    ssl_context = create_ssl_context()
-    
-    admin_client = KafkaAdminClient(
-        bootstrap_servers=KAFKA_BROKERS,
-        security_protocol='SSL',
-        ssl_context=ssl_context,
-        client_id='local-test-admin',
-        api_version=(2, 6, 0),
-        request_timeout_ms=30000
-    )
-    
-    return admin_client
+# topic -> 消息构造函数
+MESSAGE_BUILDERS = {
+    "otcol_logs": create_simple_log_message,
+    "otcol_metrics": create_simple_metrics_message,
+    "otcol_traces": create_simple_trace_message
+}
+
+TOPIC_SIGNALS = {
+    "otcol_logs": "logs",
+    "otcol_metrics": "metrics",
+    "otcol_traces": "traces"
+}
+
+def encode_value(value):
+    """producer的value序列化: 预序列化的负载(bytes)原样发送，字符串按UTF-8编码"""
+    return value if isinstance(value, bytes) else value.encode('utf-8')
+
+def create_template_builders(topics, encoding='json', resources=1, records=1, body_size=64, cardinality=10, seed=0):
+    """为每个topic创建基于预序列化模板的消息构造函数 (返回bytes)"""
+    return {
+        topic: PayloadGenerator(
+            TOPIC_SIGNALS[topic], encoding, resources=resources, records=records,
+            body_size=body_size, cardinality=cardinality, seed=seed
+        ).next
+        for topic in topics
+    }
 
 def check_and_create_topics():
     """检查并创建必需的topics"""
@@ -163,10 +155,8 @@ def check_and_create_topics():
     required_topics = ["otcol_logs", "otcol_metrics", "otcol_traces"]
     
     try:
-        admin_client = create_admin_client()
-        
         # 获取现有topics
-        existing_topics = admin_client.list_topics()
+        existing_topics = get_topic_metadata()
         print(f"  现有topics: {list(existing_topics)}")
         
         # 检查哪些topics需要创建
@@ -191,7 +181,8 @@ def check_and_create_topics():
             ]
             
             try:
-                result = admin_client.create_topics(new_topics, validate_only=False)
+                result = get_admin().create_topics(new_topics, validate_only=False)
+                invalidate_metadata()
                 
                 # 等待创建完成
                 try:
@@ -217,28 +208,20 @@ def check_and_create_topics():
         else:
             print("  ✅ 所有必需的topics都已存在")
         
-        admin_client.close()
         return True
         
     except Exception as e:
         print(f"❌ 检查topics失败: {str(e)}")
         return False
 
-def test_kafka_connection():
-    """测试Kafka连接"""
+def test_kafka_connection(topics=None):
+    """测试Kafka连接 (预先拉取topics的元数据，连接建立不计入首条消息的延迟)"""
     print("🔗 测试Kafka连接...")
     
     try:
-        ssl_context = create_ssl_context()
-        
-        producer = KafkaProducer(
-            bootstrap_servers=KAFKA_BROKERS,
-            security_protocol='SSL',
-            ssl_context=ssl_context,
-            value_serializer=lambda v: v.encode('utf-8'),
-            client_id='local-test-producer',
-            api_version=(2, 6, 0),
-            request_timeout_ms=30000,
+        producer = get_producer(
+            warm_topics=topics or list(MESSAGE_BUILDERS),
+            value_serializer=encode_value,
             retries=3
         )
         
@@ -250,7 +233,7 @@ def test_kafka_connection():
         return None
 
 def send_test_messages(producer):
-    """发送测试消息到3个topics"""
+    """同时向3个topics各发送一条测试消息，返回发送成功的 SentMessage 列表"""
     print("\n📤 发送测试消息...")
     
     messages = {
@@ -259,73 +242,628 @@ def send_test_messages(producer):
         "otcol_traces": create_simple_trace_message()
     }
     
-    success_count = 0
-    
+    pending = []
     for topic, message in messages.items():
+        print(f"  发送到 {topic}...")
+        try:
+            pending.append((topic, message, time.perf_counter(), producer.send(topic, message)))
+        except Exception as e:
+            print(f"  ❌ {topic} 发送失败: {str(e)}")
+    
+    sent = []
+    for topic, message, sent_at, future in pending:
         try:
-            print(f"  发送到 {topic}...")
-            
-            future = producer.send(topic, message)
             record_metadata = future.get(timeout=10)
+            acked_at = time.perf_counter()
             
             print(f"  ✅ {topic} 发送成功 (partition: {record_metadata.partition}, offset: {record_metadata.offset})")
-            success_count += 1
+            sent.append(SentMessage(
+                topic, record_metadata.partition, record_metadata.offset,
+                message.encode('utf-8'), sent_at, acked_at
+            ))
             
         except Exception as e:
             print(f"  ❌ {topic} 发送失败: {str(e)}")
-        
-        time.sleep(1)
     
-    return success_count
+    return sent
+
+def percentile(sorted_values, pct):
+    """按最近秩法计算百分位 (sorted_values 需已排序)"""
+    if not sorted_values:
+        return 0.0
+    rank = int(math.ceil(pct / 100.0 * len(sorted_values))) - 1
+    return sorted_values[min(max(rank, 0), len(sorted_values) - 1)]
+
+class LoadStats:
+    """单个topic的压测统计 (在producer回调线程中更新)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.acked = 0
+        self.errors = 0
+        self.bytes_acked = 0
+        self.latencies_ms = []
+
+    def record_ack(self, size, latency_ms):
+        with self.lock:
+            self.acked += 1
+            self.bytes_acked += size
+            self.latencies_ms.append(latency_ms)
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def percentiles(self, pcts):
+        latencies = sorted(self.latencies_ms)
+        return [percentile(latencies, pct) for pct in pcts]
+
+# 多进程压测的延迟直方图: 桶上界按 2^(1/4) 递增 (约19%)，从0.05ms覆盖到约800s
+HIST_BUCKETS = 96
+HIST_BASE_MS = 0.05
+
+def latency_bucket(latency_ms):
+    if latency_ms <= HIST_BASE_MS:
+        return 0
+    return min(int(math.log2(latency_ms / HIST_BASE_MS) * 4) + 1, HIST_BUCKETS - 1)
+
+def bucket_upper_ms(bucket):
+    return HIST_BASE_MS * 2 ** (bucket / 4)
+
+# 共享内存中每个 (worker, topic) 一段: sent, acked, errors, bytes, 直方图
+STAT_SENT, STAT_ACKED, STAT_ERRORS, STAT_BYTES, STAT_HIST = range(5)
+STAT_FIELDS = STAT_HIST + HIST_BUCKETS
+
+def stat_base(worker, topic_index, topic_count):
+    return (worker * topic_count + topic_index) * STAT_FIELDS
+
+class SharedLoadStats:
+    """写入共享内存的单个topic压测统计，与 LoadStats 接口相同。每段只有一个进程写入，不需要加锁"""
+
+    def __init__(self, shared, base):
+        self.shared = shared
+        self.base = base
+
+    @property
+    def sent(self):
+        return self.shared[self.base + STAT_SENT]
+
+    @sent.setter
+    def sent(self, value):
+        self.shared[self.base + STAT_SENT] = value
 
-def verify_messages():
-    """验证消息是否发送成功"""
-    print("\n🔍 验证消息...")
+    def record_ack(self, size, latency_ms):
+        self.shared[self.base + STAT_ACKED] += 1
+        self.shared[self.base + STAT_BYTES] += size
+        self.shared[self.base + STAT_HIST + latency_bucket(latency_ms)] += 1
+
+    def record_error(self):
+        self.shared[self.base + STAT_ERRORS] += 1
+
+class HistogramStats:
+    """多个worker汇总后的统计，百分位取直方图桶的上界"""
+
+    def __init__(self):
+        self.sent = 0
+        self.acked = 0
+        self.errors = 0
+        self.bytes_acked = 0
+        self.histogram = [0] * HIST_BUCKETS
+
+    def add(self, shared, base):
+        self.sent += shared[base + STAT_SENT]
+        self.acked += shared[base + STAT_ACKED]
+        self.errors += shared[base + STAT_ERRORS]
+        self.bytes_acked += shared[base + STAT_BYTES]
+        for bucket in range(HIST_BUCKETS):
+            self.histogram[bucket] += shared[base + STAT_HIST + bucket]
+
+    def percentiles(self, pcts):
+        total = sum(self.histogram)
+        results = []
+        for pct in pcts:
+            rank = max(math.ceil(pct / 100.0 * total), 1)
+            seen = 0
+            value = 0.0
+            for bucket, count in enumerate(self.histogram):
+                seen += count
+                if total and seen >= rank:
+                    value = bucket_upper_ms(bucket)
+                    break
+            results.append(value)
+        return results
+
+def aggregate_shared_stats(shared, workers, topics):
+    """返回 {topic: HistogramStats} 以及所有topic的合计"""
+    by_topic = {topic: HistogramStats() for topic in topics}
+    total = HistogramStats()
+    for worker in range(workers):
+        for index, topic in enumerate(topics):
+            base = stat_base(worker, index, len(topics))
+            by_topic[topic].add(shared, base)
+            total.add(shared, base)
+    return by_topic, total
+
+class TraceWriter:
+    """把每条已ack消息的打点和ack时刻写成NDJSON，供 otlp_sink.py --producer-trace 关联计算各段延迟"""
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.file = open(path, 'w', buffering=1024 * 1024)
+
+    def write(self, topic, stamp, metadata):
+        line = json.dumps({
+            "id": stamp.id,
+            "topic": topic,
+            "partition": metadata.partition,
+            "offset": metadata.offset,
+            "sent_unix_nano": stamp.sent_unix_nano,
+            "sent_monotonic_ns": stamp.sent_monotonic_ns,
+            "acked_unix_nano": time.time_ns(),
+            "acked_monotonic_ns": time.monotonic_ns()
+        })
+        with self.lock:
+            self.file.write(line + "\n")
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+def run_load_test(producer, topics, duration, rate_msgs=None, rate_mb=None, max_in_flight=1000, trace=None,
+                  builders=MESSAGE_BUILDERS, stats=None):
+    """
+    按目标速率持续发送消息 (msgs/sec 或 MB/sec)，通过异步回调保持多条消息在途，
+    返回每个topic的 LoadStats 和实际压测时长(秒)。trace 为 TraceWriter 时记录每条消息的打点；
+    stats 可传入 SharedLoadStats 把统计写入共享内存
+    """
+    stats = stats or {topic: LoadStats() for topic in topics}
+    in_flight = threading.BoundedSemaphore(max_in_flight)
+    rate_bytes = rate_mb * 1024 * 1024 if rate_mb else None
+
+    def on_success(topic, size, started, stamp, metadata):
+        stats[topic].record_ack(size, (time.perf_counter() - started) * 1000)
+        if trace:
+            trace.write(topic, stamp, metadata)
+        in_flight.release()
+
+    def on_error(topic, _exc):
+        stats[topic].record_error()
+        in_flight.release()
+
+    start = time.perf_counter()
+    deadline = start + duration
+    next_send = start
+    i = 0
+
+    while True:
+        now = time.perf_counter()
+        if now >= deadline:
+            break
+        if next_send > now:
+            time.sleep(min(next_send - now, deadline - now))
+            continue
+
+        topic = topics[i % len(topics)]
+        i += 1
+        stamp = new_stamp()
+        value = encode_value(builders[topic](stamp))
+        size = len(value)
+
+        in_flight.acquire()
+        started = time.perf_counter()
+        try:
+            future = producer.send(topic, value)
+        except Exception:
+            stats[topic].record_error()
+            in_flight.release()
+            continue
+        stats[topic].sent += 1
+        future.add_callback(functools.partial(on_success, topic, size, started, stamp))
+        future.add_errback(functools.partial(on_error, topic))
+
+        # 按消息数或字节数推进下一次发送时间；两者都未设置时全速发送
+        if rate_bytes:
+            next_send += size / rate_bytes
+        elif rate_msgs:
+            next_send += 1.0 / rate_msgs
+        else:
+            next_send = time.perf_counter()
+
+    producer.flush()
+    elapsed = time.perf_counter() - start
+    return stats, elapsed
+
+def print_load_report(stats, elapsed):
+    """打印每个topic的吞吐和ack延迟百分位"""
+    print(f"\n📊 压测结果 (时长: {elapsed:.1f}s)")
+    header = f"  {'topic':<15} {'sent':>8} {'acked':>8} {'errors':>7} {'msg/s':>9} {'MB/s':>7} " \
+             f"{'p50':>8} {'p95':>8} {'p99':>8} {'p999':>8}"
+    print(header)
+    print("  " + "-" * (len(header) - 2))
+
+    for topic, s in stats.items():
+        p50, p95, p99, p999 = s.percentiles((50, 95, 99, 99.9))
+        print(f"  {topic:<15} {s.sent:>8} {s.acked:>8} {s.errors:>7} "
+              f"{s.acked / elapsed:>9.1f} {s.bytes_acked / elapsed / 1024 / 1024:>7.2f} "
+              f"{p50:>7.1f}ms {p95:>7.1f}ms {p99:>7.1f}ms {p999:>7.1f}ms")
+
+def get_verify_consumer():
+    """回读验证用的消费者: 不加入消费组、不提交offset，直接assign分区"""
+    return get_consumer('local-test-verifier', group_id=None, enable_auto_commit=False)
+
+def verify_messages(sent, timeout_s=VERIFY_TIMEOUT_S):
+    """
+    用一个消费者同时assign所有测试分区，seek到发送时返回的offset，
+    确认每条消息都能按原字节读回，并报告每条消息从发送到回读poll返回的耗时。
+    该耗时以每次poll返回的时间为准 (同一次poll读到的消息共用一个时间点)，且回读在全部消息发送完成后
+    才开始，包含等待其余消息发送的时间，不是端到端的消费延迟
+    """
+    print("\n🔍 回读验证消息...")
     
     try:
-        ssl_context = create_ssl_context()
+        consumer = get_verify_consumer()
         
-        topics = ["otcol_logs", "otcol_metrics", "otcol_traces"]
-        verified_count = 0
+        pending = {(m.topic, m.partition, m.offset): m for m in sent}
+        positions = {}
+        for m in sent:
+            tp = TopicPartition(m.topic, m.partition)
+            positions[tp] = min(positions.get(tp, m.offset), m.offset)
         
-        for topic in topics:
-            try:
-                print(f"  检查 {topic}...")
-                
-                consumer = KafkaConsumer(
-                    topic,
-                    bootstrap_servers=KAFKA_BROKERS,
-                    security_protocol='SSL',
-                    ssl_context=ssl_context,
-                    auto_offset_reset='latest',
-                    consumer_timeout_ms=5000,
-                    client_id=f'local-test-consumer-{topic}'
-                )
-                
-                # 检查是否有分区分配
-                partitions = consumer.partitions_for_topic(topic)
-                if partitions:
-                    print(f"    ✅ {topic} 存在 (分区: {len(partitions)})")
+        consumer.assign(list(positions))
+        for tp, offset in positions.items():
+            consumer.seek(tp, offset)
+        
+        verified_count = 0
+        deadline = time.monotonic() + timeout_s
+        while pending and time.monotonic() < deadline:
+            records = consumer.poll(timeout_ms=500)
+            polled_at = time.perf_counter()
+            
+            for tp, messages in records.items():
+                for record in messages:
+                    m = pending.pop((tp.topic, tp.partition, record.offset), None)
+                    if m is None:
+                        continue
+                    
+                    if record.value != m.value:
+                        print(f"  ❌ {m.topic} 内容不一致 (partition: {m.partition}, offset: {m.offset}, "
+                              f"发送 {len(m.value)} 字节, 读回 {len(record.value or b'')} 字节)")
+                        continue
+                    
+                    print(f"  ✅ {m.topic} 读回一致 (partition: {m.partition}, offset: {m.offset}) "
+                          f"ack: {(m.acked_at - m.sent_at) * 1000:.1f}ms, "
+                          f"发送→poll返回: {(polled_at - m.sent_at) * 1000:.1f}ms")
                     verified_count += 1
-                else:
-                    print(f"    ⚠️ {topic} 不存在或无分区")
-                
-                consumer.close()
-                
-            except Exception as e:
-                print(f"    ❌ 检查 {topic} 失败: {str(e)}")
+            
+            # 已读到的分区不再继续拉取
+            done = [tp for tp in positions if not any(key[:2] == (tp.topic, tp.partition) for key in pending)]
+            if done:
+                consumer.pause(*done)
         
+        for m in pending.values():
+            print(f"  ⚠️ {m.topic} {timeout_s}s内未读回 (partition: {m.partition}, offset: {m.offset})")
+        
+        consumer.unassign()
         return verified_count
         
     except Exception as e:
         print(f"❌ 验证过程失败: {str(e)}")
         return 0
 
-def main():
-    print("🚀 本地Kafka mTLS测试")
-    print("=" * 40)
-    print(f"连接到Kafka集群: {KAFKA_BROKERS}")
-    print("=" * 40)
+def track_cpu(cpu, index, interval=0.5):
+    """定期把本进程的CPU时间写入共享内存"""
+    while True:
+        cpu[index] = time.process_time()
+        time.sleep(interval)
+
+def load_worker(index, args, topics, shared, cpu, ready):
+    """压测子进程: 独立的producer和负载生成器，统计写入共享内存中自己的那一段"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # 由主进程处理Ctrl-C
+    try:
+        producer = get_producer(
+            client_id=f'local-test-producer-{index}',
+            warm_topics=topics,
+            value_serializer=encode_value,
+            retries=3
+        )
+        builders = MESSAGE_BUILDERS
+        if args.payload == 'template':
+            builders = create_template_builders(
+                topics, args.encoding, args.resources, args.records, args.body_size, args.cardinality, seed=index
+            )
+        stats = {
+            topic: SharedLoadStats(shared, stat_base(index, i, len(topics))) for i, topic in enumerate(topics)
+        }
+        threading.Thread(target=track_cpu, args=(cpu, index), daemon=True).start()
+    except Exception as e:
+        print(f"❌ worker {index} 启动失败: {str(e)}")
+        ready.abort()
+        return
+
+    # 所有worker连接完成后同时开始，连接建立不计入压测时间
+    ready.wait()
+    run_load_test(
+        producer, topics, args.duration,
+        rate_msgs=args.rate / args.workers if args.rate else None,
+        rate_mb=args.rate_mb / args.workers if args.rate_mb else None,
+        max_in_flight=args.max_in_flight, builders=builders, stats=stats
+    )
+    cpu[index] = time.process_time()
+    close_all()
+
+def run_multiprocess_load(args, topics, records_per_message):
+    """
+    启动多个压测进程 (各自的producer和负载生成器，绕开GIL)，通过共享内存汇总吞吐和延迟直方图，
+    压测期间定期打印合计的实时速率、延迟和每个worker的平均CPU占用。
+    worker CPU接近100%而broker未饱和时瓶颈在客户端，反之在集群
+    """
+    ctx = multiprocessing.get_context('spawn')
+    shared = ctx.Array('q', args.workers * len(topics) * STAT_FIELDS, lock=False)
+    cpu = ctx.Array('d', args.workers, lock=False)
+    ready = ctx.Barrier(args.workers + 1)
+
+    processes = [
+        ctx.Process(target=load_worker, args=(i, args, topics, shared, cpu, ready), daemon=True)
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+
+    print(f"⏳ 等待 {args.workers} 个worker建立连接...")
+    try:
+        ready.wait(timeout=120)
+    except threading.BrokenBarrierError:
+        print("❌ worker启动失败，退出测试")
+        for process in processes:
+            process.terminate()
+        sys.exit(1)
+
+    started = time.perf_counter()
+    last_time, last_acked, last_bytes, last_cpu = started, 0, 0, 0.0
+    next_report = started + args.report_interval
+    print(f"\n  {'时间':>6} {'msg/s':>10} {'MB/s':>8} {'acked':>10} {'errors':>7} {'p50':>8} {'p99':>8} {'CPU/worker':>10}")
+
+    try:
+        while any(process.is_alive() for process in processes):
+            time.sleep(0.1)
+            now = time.perf_counter()
+            if now < next_report:
+                continue
+            next_report = now + args.report_interval
+
+            _, total = aggregate_shared_stats(shared, args.workers, topics)
+            cpu_total = sum(cpu)
+            interval = now - last_time
+            p50, p99 = total.percentiles((50, 99))
+            print(f"  {now - started:>5.0f}s {(total.acked - last_acked) / interval:>10,.0f} "
+                  f"{(total.bytes_acked - last_bytes) / interval / 1024 / 1024:>8.2f} {total.acked:>10} "
+                  f"{total.errors:>7} {p50:>6.1f}ms {p99:>6.1f}ms "
+                  f"{(cpu_total - last_cpu) / interval / args.workers * 100:>9.0f}%")
+            last_time, last_acked, last_bytes, last_cpu = now, total.acked, total.bytes_acked, cpu_total
+
+    except KeyboardInterrupt:
+        print("\n⏹️ 压测被用户中断")
+        for process in processes:
+            process.terminate()
+
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    by_topic, total = aggregate_shared_stats(shared, args.workers, topics)
+    print_load_report(by_topic, elapsed)
+    print(f"  合计: {total.acked / elapsed:,.1f} msg/s, {total.bytes_acked / elapsed / 1024 / 1024:.2f} MB/s "
+          f"({args.workers} 个worker, 平均CPU {sum(cpu) / elapsed / args.workers * 100:.0f}%)")
+    if records_per_message > 1:
+        print(f"  记录速率: {total.acked * records_per_message / elapsed:,.0f} 条/s")
+
+def run_load_mode(args):
+    """load模式: 按目标速率压测topics并报告吞吐和延迟"""
+    topics = args.topics or list(MESSAGE_BUILDERS)
+    unknown = [t for t in topics if t not in MESSAGE_BUILDERS]
+    if unknown:
+        print(f"❌ 不支持的topics: {unknown}")
+        sys.exit(1)
+
+    if args.rate_mb:
+        target = f"{args.rate_mb} MB/s"
+    elif args.rate:
+        target = f"{args.rate} msg/s"
+    else:
+        target = "不限速"
+    print(f"🔥 压测模式: topics={topics}, 目标={target}, 时长={args.duration}s, 最大在途={args.max_in_flight}")
+
+    builders = MESSAGE_BUILDERS
+    records_per_message = 1
+    if args.payload == 'template':
+        records_per_message = args.resources * args.records
+        print(f"🧩 预序列化模板: {args.encoding}, {args.resources} resources × {args.records} 条记录/消息")
+
+    if args.workers > 1:
+        if args.trace_file:
+            print("❌ 多进程模式不支持 --trace-file")
+            sys.exit(1)
+        run_multiprocess_load(args, topics, records_per_message)
+        return
+
+    if args.payload == 'template':
+        builders = create_template_builders(
+            topics, args.encoding, args.resources, args.records, args.body_size, args.cardinality
+        )
+
+    producer = test_kafka_connection(topics)
+    if not producer:
+        print("❌ 无法连接到Kafka，退出测试")
+        sys.exit(1)
+
+    trace = TraceWriter(args.trace_file) if args.trace_file else None
+    try:
+        stats, elapsed = run_load_test(
+            producer, topics, args.duration,
+            rate_msgs=args.rate, rate_mb=args.rate_mb, max_in_flight=args.max_in_flight, trace=trace,
+            builders=builders
+        )
+        print_load_report(stats, elapsed)
+        if records_per_message > 1:
+            acked = sum(s.acked for s in stats.values())
+            print(f"  记录速率: {acked * records_per_message / elapsed:,.0f} 条/s")
+        if trace:
+            print(f"📝 打点记录已写入: {args.trace_file}")
+    except KeyboardInterrupt:
+        print("\n⏹️ 压测被用户中断")
+    finally:
+        close_all()
+        if trace:
+            trace.close()
+
+def parse_acks(value):
+    return value if value == 'all' else int(value)
+
+def tuning_matrix(args):
+    """按参数列表的笛卡尔积生成producer配置"""
+    return [
+        {
+            'batch_size': batch_size,
+            'linger_ms': linger_ms,
+            'compression_type': None if compression == 'none' else compression,
+            'acks': acks,
+            'max_in_flight_requests_per_connection': max_in_flight
+        }
+        for batch_size, linger_ms, compression, acks, max_in_flight in itertools.product(
+            args.batch_size, args.linger_ms, args.compression, args.acks, args.max_in_flight_requests
+        )
+    ]
+
+def run_tuning_case(args, topics, config, builders):
+    """用一组producer配置压测 args.duration 秒，返回吞吐、延迟、压缩后字节和CPU"""
+    try:
+        producer = create_producer(
+            client_id='local-test-tuning',
+            warm_topics=topics,
+            bootstrap_servers=args.bootstrap,
+            value_serializer=encode_value,
+            retries=3,
+            **config
+        )
+    except Exception as e:
+        # 例如缺少snappy/lz4/zstd的压缩库
+        return {'error': str(e)}
+
+    try:
+        cpu_started = time.process_time()
+        stats, elapsed = run_load_test(
+            producer, topics, args.duration,
+            rate_msgs=args.rate, rate_mb=args.rate_mb, max_in_flight=args.max_in_flight, builders=builders
+        )
+        cpu = time.process_time() - cpu_started
+        metrics = producer.metrics().get('producer-metrics', {})
+    finally:
+        producer.close()
+
+    total = LoadStats()
+    for s in stats.values():
+        total.sent += s.sent
+        total.acked += s.acked
+        total.errors += s.errors
+        total.bytes_acked += s.bytes_acked
+        total.latencies_ms.extend(s.latencies_ms)
+    p50, p95, p99, p999 = total.percentiles((50, 95, 99, 99.9))
+
+    # compression-rate-avg 为压缩后/压缩前的字节比，未压缩时为1
+    compression_ratio = metrics.get('compression-rate-avg') or 1.0
+    mb_per_s = total.bytes_acked / elapsed / 1024 / 1024
+    return {
+        'msgs_per_s': round(total.acked / elapsed, 1),
+        'mb_per_s': round(mb_per_s, 3),
+        'wire_mb_per_s': round(mb_per_s * compression_ratio, 3),
+        'compression_ratio': round(compression_ratio, 3),
+        'batch_size_avg': round(metrics.get('batch-size-avg') or 0.0, 1),
+        'p50_ms': round(p50, 2),
+        'p95_ms': round(p95, 2),
+        'p99_ms': round(p99, 2),
+        'p999_ms': round(p999, 2),
+        'errors': total.errors,
+        'cpu_s': round(cpu, 2),
+        'cpu_pct': round(cpu / elapsed * 100, 1)
+    }
+
+TUNING_COLUMNS = [
+    'batch_size', 'linger_ms', 'compression_type', 'acks', 'max_in_flight_requests_per_connection',
+    'msgs_per_s', 'mb_per_s', 'wire_mb_per_s', 'compression_ratio', 'batch_size_avg',
+    'p50_ms', 'p95_ms', 'p99_ms', 'p999_ms', 'errors', 'cpu_s', 'cpu_pct', 'error'
+]
+
+def write_tuning_report(prefix, meta, rows):
+    """写入 <prefix>.csv 和 <prefix>.json，便于在多次运行之间diff"""
+    with open(f"{prefix}.csv", 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=TUNING_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({key: row.get(key, '') for key in TUNING_COLUMNS})
+
+    with open(f"{prefix}.json", 'w') as f:
+        json.dump(dict(meta, results=rows), f, indent=2, ensure_ascii=False)
+
+    print(f"📝 结果已写入: {prefix}.csv, {prefix}.json")
+
+def run_tune_mode(args):
+    """tune模式: 依次用矩阵中的每组producer参数压测，比较吞吐、延迟、网络字节和CPU"""
+    topics = args.topics or list(MESSAGE_BUILDERS)
+    matrix = tuning_matrix(args)
+    print(f"🎛️ 参数对比: {len(matrix)} 组配置 × {args.duration}s (预计 {len(matrix) * args.duration / 60:.1f} 分钟), "
+          f"目标: {args.bootstrap or KAFKA_BROKERS}")
+
+    builders = MESSAGE_BUILDERS
+    if args.payload == 'template':
+        builders = create_template_builders(
+            topics, args.encoding, args.resources, args.records, args.body_size, args.cardinality
+        )
+
+    header = f"  {'batch':>7} {'linger':>6} {'codec':>6} {'acks':>4} {'mif':>3} {'msg/s':>9} {'MB/s':>7} " \
+             f"{'wireMB/s':>8} {'p50':>8} {'p99':>8} {'CPU':>5}"
+    print(header)
+    print("  " + "-" * (len(header) - 2))
+
+    rows = []
+    try:
+        for config in matrix:
+            result = run_tuning_case(args, topics, config, builders)
+            row = dict(config, compression_type=config['compression_type'] or 'none', **result)
+            rows.append(row)
+
+            prefix = f"  {config['batch_size']:>7} {config['linger_ms']:>6} {row['compression_type']:>6} " \
+                     f"{config['acks']:>4} {config['max_in_flight_requests_per_connection']:>3}"
+            if 'error' in result:
+                print(f"{prefix} ❌ {result['error']}")
+                continue
+            print(f"{prefix} {result['msgs_per_s']:>9.1f} {result['mb_per_s']:>7.2f} {result['wire_mb_per_s']:>8.2f} "
+                  f"{result['p50_ms']:>6.1f}ms {result['p99_ms']:>6.1f}ms {result['cpu_pct']:>4.0f}%")
+    except KeyboardInterrupt:
+        print("\n⏹️ 参数对比被用户中断，保存已完成的结果")
+
+    completed = [row for row in rows if 'error' not in row and not row['errors']]
+    if completed:
+        fastest = max(completed, key=lambda row: row['msgs_per_s'])
+        lowest = min(completed, key=lambda row: row['p99_ms'])
+        describe = lambda row: (f"batch={row['batch_size']} linger={row['linger_ms']} codec={row['compression_type']} "
+                                f"acks={row['acks']} mif={row['max_in_flight_requests_per_connection']}")
+        print(f"\n🏆 最高吞吐: {describe(fastest)} ({fastest['msgs_per_s']:.1f} msg/s)")
+        print(f"🏆 最低p99:  {describe(lowest)} ({lowest['p99_ms']:.1f}ms)")
+
+    meta = {
+        'started_at': datetime.now().isoformat(),
+        'target': args.bootstrap or KAFKA_BROKERS,
+        'topics': topics,
+        'duration_s': args.duration,
+        'payload': args.payload,
+        'encoding': args.encoding if args.payload == 'template' else 'json',
+        'records_per_message': args.resources * args.records if args.payload == 'template' else 1
+    }
+    write_tuning_report(args.output or f"producer_tuning_{datetime.now():%Y%m%d_%H%M%S}", meta, rows)
+
+def run_smoke_mode():
+    """smoke模式: 检查topics，发送并验证每个topic一条消息"""
     
     # 检查并创建topics
     if not check_and_create_topics():
@@ -340,25 +878,28 @@ def main():
         sys.exit(1)
     
     try:
+        # 提前完成回读消费者的引导连接，不计入发送→poll返回的耗时
+        get_verify_consumer().topics()
+        
         # 发送消息
-        success_count = send_test_messages(producer)
+        sent = send_test_messages(producer)
+        success_count = len(sent)
         
-        # 刷新并关闭生产者
+        # 刷新生产者 (由close_all统一关闭)
         producer.flush()
-        producer.close()
         
         print(f"\n📊 发送结果: {success_count}/3 成功")
         
         if success_count > 0:
             # 验证消息
-            verified_count = verify_messages()
-            print(f"📊 验证结果: {verified_count}/3 成功")
+            verified_count = verify_messages(sent)
+            print(f"📊 验证结果: {verified_count}/{success_count} 读回一致")
             
             print("\n" + "=" * 40)
             print("📋 测试总结:")
             print(f"  连接状态: ✅")
             print(f"  消息发送: {success_count}/3")
-            print(f"  Topic验证: {verified_count}/3")
+            print(f"  回读验证: {verified_count}/{success_count}")
             
             if success_count > 0:
                 print("\n🎉 测试成功！消息已发送到Kafka集群")
@@ -373,8 +914,62 @@ def main():
     except Exception as e:
         print(f"\n❌ 测试过程中出错: {str(e)}")
     finally:
-        if producer:
-            producer.close()
+        close_all()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='本地Kafka mTLS测试工具')
+    parser.add_argument('mode', nargs='?', default='smoke', choices=['smoke', 'load', 'tune'],
+                        help='运行模式: smoke(发送并验证单条消息, 默认), load(持续压测), tune(producer参数对比)')
+    parser.add_argument('--topics', nargs='+', help='压测的topics (默认: otcol_logs otcol_metrics otcol_traces)')
+    parser.add_argument('--duration', type=float, default=30, help='压测时长(秒) (默认: 30)')
+    rate = parser.add_mutually_exclusive_group()
+    rate.add_argument('--rate', type=float, help='目标速率 msgs/sec (所有topics合计)')
+    rate.add_argument('--rate-mb', type=float, help='目标速率 MB/sec (所有topics合计)')
+    parser.add_argument('--max-in-flight', type=int, default=1000, help='最大在途消息数 (默认: 1000)')
+    parser.add_argument('--trace-file', help='把每条消息的打点和ack时刻写入该NDJSON文件 (供 otlp_sink.py 关联)')
+    parser.add_argument('--payload', choices=['simple', 'template'], default='simple',
+                        help='压测负载: simple(每条消息单条记录，逐条json.dumps), template(预序列化模板，高吞吐)')
+    parser.add_argument('--encoding', choices=ENCODINGS, default='json', help='template负载的编码 (默认: json)')
+    parser.add_argument('--resources', type=int, default=1, help='template负载每条消息的resource数 (默认: 1)')
+    parser.add_argument('--records', type=int, default=100, help='template负载每个resource的记录数 (默认: 100)')
+    parser.add_argument('--body-size', type=int, default=64, help='template负载的日志body长度 (默认: 64)')
+    parser.add_argument('--cardinality', type=int, default=10, help='template负载每个属性的取值个数 (默认: 10)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='压测进程数，>1时每个进程独立的producer，速率目标按进程平分 (默认: 1)')
+    parser.add_argument('--report-interval', type=float, default=5, help='多进程压测的实时报告间隔(秒) (默认: 5)')
+    parser.add_argument('--profile', action='store_true', help='结束时打印连接建立与实际工作的耗时')
+
+    tune = parser.add_argument_group('tune模式参数 (每个参数可给多个值，按笛卡尔积组合)')
+    tune.add_argument('--batch-size', type=int, nargs='+', default=[16384, 131072], help='batch_size (字节)')
+    tune.add_argument('--linger-ms', type=int, nargs='+', default=[0, 10], help='linger_ms')
+    tune.add_argument('--compression', nargs='+', default=['none', 'gzip', 'lz4', 'zstd'],
+                      choices=['none', 'gzip', 'snappy', 'lz4', 'zstd'], help='compression_type')
+    tune.add_argument('--acks', type=parse_acks, nargs='+', default=['all'], help='acks: 0, 1, all')
+    tune.add_argument('--max-in-flight-requests', type=int, nargs='+', default=[5],
+                      help='max_in_flight_requests_per_connection')
+    tune.add_argument('--bootstrap', help='改为以明文连接该地址的本地测试broker (如 localhost:9092)')
+    tune.add_argument('--output', help='结果文件前缀，生成 <前缀>.csv 和 <前缀>.json (默认: producer_tuning_<时间>)')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    print("🚀 本地Kafka mTLS测试")
+    print("=" * 40)
+    print(f"连接到Kafka集群: {KAFKA_BROKERS}")
+    print("=" * 40)
+    if not (args.mode == 'tune' and args.bootstrap):
+        check_cert_files()
+
+    if args.mode == 'load':
+        run_load_mode(args)
+    elif args.mode == 'tune':
+        run_tune_mode(args)
+    else:
+        run_smoke_mode()
+
+    if args.profile:
+        PROFILER.report()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
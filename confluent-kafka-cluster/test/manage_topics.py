@@ -3,59 +3,34 @@
 Kafka Topic管理脚本 - 通过外部接口直接操作
 """
 
-import os
 import sys
-import ssl
+import json
+import math
+import time
 import argparse
-from kafka.admin import KafkaAdminClient, NewTopic
+from kafka import TopicPartition
+from kafka.admin import NewTopic, NewPartitions, ConfigResource, ConfigResourceType
 from kafka.errors import TopicAlreadyExistsError
 
-# Kafka外部IP地址
-KAFKA_BROKERS = [
-    '35.197.206.204:9093',   # kafka-0-internal
-    '34.147.221.36:9093',    # kafka-1-internal  
-    '34.39.39.253:9093'      # kafka-2-internal
-]
-
-# 证书文件路径
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
-
-CERT_FILES = {
-    'ca_cert': os.path.join(PROJECT_ROOT, 'deploy/certs/ca-cert.pem'),
-    'client_cert': os.path.join(PROJECT_ROOT, 'deploy/certs/kafka-client-cert.pem'),
-    'client_key': os.path.join(PROJECT_ROOT, 'deploy/certs/kafka-client-key.pem')
-}
-
-def create_admin_client():
-    """创建Kafka管理客户端"""
-    context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
-    context.check_hostname = False
-    context.verify_mode = ssl.CERT_REQUIRED
-    context.load_verify_locations(CERT_FILES['ca_cert'])
-    context.load_cert_chain(CERT_FILES['client_cert'], CERT_FILES['client_key'])
-    
-    return KafkaAdminClient(
-        bootstrap_servers=KAFKA_BROKERS,
-        security_protocol='SSL',
-        ssl_context=context,
-        client_id='topic-manager',
-        api_version=(2, 6, 0),
-        request_timeout_ms=30000
-    )
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+from kafka_clients import (
+    KAFKA_BROKERS, PROFILER, get_admin, get_consumer, get_group_offsets, get_topic_metadata, invalidate_metadata
+)
 
 def list_topics():
     """列出所有topics"""
     print("📋 当前Kafka集群中的topics:")
     try:
-        admin_client = create_admin_client()
-        topics = admin_client.list_topics()
+        topics = get_topic_metadata()
         
         for topic in sorted(topics):
             if not topic.startswith('__'):  # 过滤内部topics
                 print(f"  ✅ {topic}")
         
-        admin_client.close()
         return list(topics)
         
     except Exception as e:
@@ -67,13 +42,10 @@ def create_topic(topic_name, partitions=6, replication_factor=1):
     print(f"🔨 创建topic: {topic_name}")
     
     try:
-        admin_client = create_admin_client()
-        
         # 检查topic是否已存在
-        existing_topics = admin_client.list_topics()
+        existing_topics = get_topic_metadata()
         if topic_name in existing_topics:
             print(f"⚠️ Topic '{topic_name}' 已存在")
-            admin_client.close()
             return True
         
         # 创建新topic
@@ -83,10 +55,10 @@ def create_topic(topic_name, partitions=6, replication_factor=1):
             replication_factor=replication_factor
         )
         
-        admin_client.create_topics([new_topic], validate_only=False)
+        get_admin().create_topics([new_topic], validate_only=False)
+        invalidate_metadata()
         print(f"✅ Topic '{topic_name}' 创建成功")
         
-        admin_client.close()
         return True
         
     except Exception as e:
@@ -98,35 +70,36 @@ def delete_topic(topic_name):
     print(f"🗑️ 删除topic: {topic_name}")
     
     try:
-        admin_client = create_admin_client()
-        
         # 检查topic是否存在
-        existing_topics = admin_client.list_topics()
+        existing_topics = get_topic_metadata()
         if topic_name not in existing_topics:
             print(f"⚠️ Topic '{topic_name}' 不存在")
-            admin_client.close()
             return True
         
         # 删除topic
-        admin_client.delete_topics([topic_name])
+        get_admin().delete_topics([topic_name])
+        invalidate_metadata()
         print(f"✅ Topic '{topic_name}' 删除成功")
         
-        admin_client.close()
         return True
         
     except Exception as e:
         print(f"❌ 删除topic失败: {str(e)}")
         return False
 
+REQUIRED_TOPICS = ["otcol_logs", "otcol_metrics", "otcol_traces"]
+
+# kafka-to-otlp-bridge 每个topic一个消费组
+BRIDGE_GROUP_PREFIX = 'kafka-to-otlp-'
+
 def ensure_required_topics():
     """确保必需的topics存在"""
-    required_topics = ["otcol_logs", "otcol_metrics", "otcol_traces"]
+    required_topics = REQUIRED_TOPICS
     
     print("🔍 检查必需的topics...")
     
     try:
-        admin_client = create_admin_client()
-        existing_topics = admin_client.list_topics()
+        existing_topics = get_topic_metadata()
         
         topics_to_create = []
         for topic in required_topics:
@@ -145,27 +118,475 @@ def ensure_required_topics():
                 for topic in topics_to_create
             ]
             
-            admin_client.create_topics(new_topics, validate_only=False)
+            get_admin().create_topics(new_topics, validate_only=False)
+            invalidate_metadata()
             
             for topic in topics_to_create:
                 print(f"  ✅ {topic} 创建成功")
         else:
             print("✅ 所有必需的topics都已存在")
         
-        admin_client.close()
         return True
         
     except Exception as e:
         print(f"❌ 检查/创建topics失败: {str(e)}")
         return False
 
+def load_topic_spec(path):
+    """
+    读取topic声明文件 (YAML或JSON)，返回 {topic: {partitions, replication_factor, configs}}。
+    defaults 中的值作为每个topic的默认值，configs 按键合并
+    """
+    with open(path) as f:
+        if path.endswith(('.yaml', '.yml')):
+            if yaml is None:
+                raise RuntimeError("读取YAML需要安装PyYAML (pip install pyyaml)，或改用JSON格式")
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+
+    defaults = spec.get('defaults', {})
+    topics = {}
+    for entry in spec.get('topics', []):
+        name = entry.get('name')
+        if not name:
+            raise ValueError(f"topic缺少name: {entry}")
+        if name in topics:
+            raise ValueError(f"topic重复声明: {name}")
+
+        configs = dict(defaults.get('configs', {}))
+        configs.update(entry.get('configs', {}))
+        topics[name] = {
+            'partitions': int(entry.get('partitions', defaults.get('partitions', 6))),
+            'replication_factor': int(entry.get('replication_factor', defaults.get('replication_factor', 1))),
+            # broker返回的配置值都是字符串，统一后才能比较
+            'configs': {key: str(value).lower() if isinstance(value, bool) else str(value)
+                        for key, value in configs.items()}
+        }
+    return topics
+
+def describe_topic_configs(topic_names):
+    """一次请求读取多个topic的自定义配置 (不含默认值)，返回 {topic: {key: value}}"""
+    if not topic_names:
+        return {}
+
+    result = get_admin().describe_configs(
+        [ConfigResource(ConfigResourceType.TOPIC, name) for name in topic_names]
+    )
+    configs = {name: {} for name in topic_names}
+
+    # kafka-python 3.x 返回已解析的字典
+    if isinstance(result, dict):
+        for resources in result.values():
+            for name, entries in resources.items():
+                configs[name] = {key: entry.get('value') if isinstance(entry, dict) else entry
+                                 for key, entry in entries.items()}
+        return configs
+
+    # kafka-python 2.x 返回 DescribeConfigsResponse 列表，需要过滤掉默认值
+    for response in result:
+        for error_code, error_message, _type, name, entries in response.resources:
+            if error_code:
+                raise RuntimeError(f"读取 {name} 配置失败: {error_message}")
+            for entry in entries:
+                key, value = entry[0], entry[1]
+                # v0: (name, value, read_only, is_default, is_sensitive)
+                # v1: (name, value, read_only, config_source, is_sensitive, synonyms)，1 表示topic级配置
+                is_override = entry[3] == 1 if len(entry) > 5 else not entry[3]
+                if is_override:
+                    configs[name][key] = value
+    return configs
+
+def plan_topic_changes(desired, metadata, current_configs):
+    """对比声明和集群现状，返回 (待创建, 待扩分区, 待修改配置, 无法自动处理的差异)"""
+    creates, partition_increases, config_changes, unsupported = {}, {}, {}, []
+
+    for name, spec in sorted(desired.items()):
+        partitions = metadata.get(name)
+        if partitions is None:
+            creates[name] = spec
+            continue
+
+        if spec['partitions'] > len(partitions):
+            partition_increases[name] = spec['partitions']
+        elif spec['partitions'] < len(partitions):
+            unsupported.append(f"{name}: 分区数不能从 {len(partitions)} 减少到 {spec['partitions']}")
+
+        current_rf = len(partitions[0]['replicas']) if partitions else 0
+        if current_rf and spec['replication_factor'] != current_rf:
+            unsupported.append(f"{name}: 副本因子 {current_rf} -> {spec['replication_factor']} 需要分区重分配")
+
+        current = current_configs.get(name, {})
+        changed = {key: value for key, value in spec['configs'].items() if current.get(key) != value}
+        if changed:
+            # AlterConfigs会把未提交的配置重置为默认值，因此提交完整的自定义配置
+            config_changes[name] = (changed, dict(current, **spec['configs']))
+
+    return creates, partition_increases, config_changes, unsupported
+
+def apply_topic_spec(path, dry_run=False):
+    """按声明文件批量创建topic、增加分区和修改配置，每类变更只发送一次请求"""
+    print(f"📄 应用topic声明: {path}")
+
+    try:
+        desired = load_topic_spec(path)
+        metadata = get_topic_metadata(refresh=True)
+        current_configs = describe_topic_configs([name for name in desired if name in metadata])
+    except Exception as e:
+        print(f"❌ 读取声明或集群状态失败: {str(e)}")
+        return False
+
+    creates, partition_increases, config_changes, unsupported = plan_topic_changes(
+        desired, metadata, current_configs
+    )
+
+    print(f"📋 声明topics: {len(desired)}，已存在: {len(desired) - len(creates)}")
+    for name, spec in creates.items():
+        print(f"  ➕ {name} (分区: {spec['partitions']}, 副本: {spec['replication_factor']}, 配置: {spec['configs']})")
+    for name, count in partition_increases.items():
+        print(f"  📈 {name} 分区 {len(metadata[name])} -> {count}")
+    for name, (changed, _) in config_changes.items():
+        print(f"  ⚙️ {name} 配置 {changed}")
+    for message in unsupported:
+        print(f"  ⚠️ {message}")
+
+    if not (creates or partition_increases or config_changes):
+        print("✅ 集群已与声明一致")
+        return not unsupported
+    if dry_run:
+        print("🔍 dry-run: 未做任何修改")
+        return not unsupported
+
+    admin = get_admin()
+    ok = True
+    steps = [
+        ('创建topics', creates, lambda: admin.create_topics([
+            NewTopic(name=name, num_partitions=spec['partitions'],
+                     replication_factor=spec['replication_factor'], topic_configs=spec['configs'])
+            for name, spec in creates.items()
+        ], validate_only=False)),
+        ('增加分区', partition_increases, lambda: admin.create_partitions({
+            name: NewPartitions(total_count=count) for name, count in partition_increases.items()
+        })),
+        ('修改配置', config_changes, lambda: admin.alter_configs([
+            ConfigResource(ConfigResourceType.TOPIC, name, configs=configs)
+            for name, (_, configs) in config_changes.items()
+        ])),
+    ]
+    for label, changes, request in steps:
+        if not changes:
+            continue
+        try:
+            request()
+            print(f"✅ {label}: {len(changes)} 个topic")
+        except Exception as e:
+            print(f"❌ {label}失败: {str(e)}")
+            ok = False
+
+    invalidate_metadata()
+    return ok and not unsupported
+
+def sample_offsets(topics, group_prefix=BRIDGE_GROUP_PREFIX):
+    """
+    采样一次所有分区的end offset和消费组已提交的offset。
+    end offsets 一次批量请求 (按leader分组)，已提交offset每个消费组一次请求；连接复用缓存的客户端
+    """
+    metadata = get_topic_metadata()
+    partitions = [TopicPartition(topic, p['partition']) for topic in topics for p in metadata.get(topic, [])]
+
+    consumer = get_consumer('topic-manager-lag', group_id=None, enable_auto_commit=False)
+    end_offsets = consumer.end_offsets(partitions)
+
+    committed = {}
+    for topic in topics:
+        for tp, offset in get_group_offsets(f'{group_prefix}{topic}').items():
+            if tp.topic == topic and offset.offset >= 0:
+                committed[tp] = offset.offset
+
+    return time.monotonic(), end_offsets, committed
+
+def _skew(values):
+    """最大值/平均值，1.0表示完全均匀"""
+    mean = sum(values) / len(values) if values else 0
+    return max(values) / mean if mean > 0 else 1.0
+
+def print_lag_report(previous, current, group_prefix=BRIDGE_GROUP_PREFIX):
+    """打印每个分区的lag、写入/消费速率，以及每个topic的合计和分区倾斜"""
+    started, end_before, committed_before = previous
+    now, end_offsets, committed = current
+    interval = max(now - started, 1e-6)
+
+    topics = sorted({tp.topic for tp in end_offsets})
+    for topic in topics:
+        print(f"\n📈 {topic} (消费组: {group_prefix}{topic})")
+        print(f"  {'分区':>4} {'end offset':>12} {'已提交':>12} {'lag':>10} {'写入/s':>10} {'消费/s':>10}")
+
+        lags, produce_rates, consume_rates = [], [], []
+        for tp in sorted((tp for tp in end_offsets if tp.topic == topic), key=lambda tp: tp.partition):
+            end = end_offsets[tp]
+            produce_rate = (end - end_before.get(tp, end)) / interval
+            produce_rates.append(produce_rate)
+
+            if tp not in committed:
+                print(f"  {tp.partition:>6} {end:>12} {'-':>14} {'-':>10} {produce_rate:>11.1f} {'-':>11}")
+                continue
+
+            lag = max(end - committed[tp], 0)
+            consume_rate = (committed[tp] - committed_before.get(tp, committed[tp])) / interval
+            lags.append(lag)
+            consume_rates.append(consume_rate)
+            print(f"  {tp.partition:>6} {end:>12} {committed[tp]:>14} {lag:>10} {produce_rate:>11.1f} {consume_rate:>11.1f}")
+
+        if not lags:
+            print("  ⚠️ 消费组没有已提交的offset (未运行或尚未提交)")
+            continue
+
+        total_lag = sum(lags)
+        produce_total, consume_total = sum(produce_rates), sum(consume_rates)
+        if total_lag == 0:
+            status = "✅ 已追上"
+        elif consume_total > produce_total:
+            status = f"⏳ 预计 {total_lag / (consume_total - produce_total):.0f}s 追上"
+        else:
+            status = "⚠️ 消费速度跟不上写入"
+        print(f"  合计 lag: {total_lag}, 写入: {produce_total:.1f}/s, 消费: {consume_total:.1f}/s, "
+              f"lag倾斜: {_skew(lags):.2f}, 写入倾斜: {_skew(produce_rates):.2f}  {status}")
+
+def show_lag(topics, interval=5.0, watch=False, group_prefix=BRIDGE_GROUP_PREFIX):
+    """间隔 interval 秒采样两次计算速率；watch 时持续刷新，每次只发送offset请求"""
+    try:
+        previous = sample_offsets(topics, group_prefix)
+        while True:
+            time.sleep(interval)
+            current = sample_offsets(topics, group_prefix)
+            if watch and sys.stdout.isatty():
+                print("\033[H\033[J", end="")
+            print(f"🕒 {time.strftime('%H:%M:%S')} (采样间隔 {interval:g}s)")
+            print_lag_report(previous, current, group_prefix)
+            if not watch:
+                return True
+            previous = current
+
+    except KeyboardInterrupt:
+        return True
+    except Exception as e:
+        print(f"❌ 获取消费进度失败: {str(e)}")
+        return False
+
+def describe_partition_sizes(topics):
+    """
+    返回 {(topic, 分区): 字节数}，取各副本中最大的日志大小。
+    kafka-python 2.0 没有 describe_log_dirs，2.1-2.3 的 describe_log_dirs 不接受参数且返回原始响应；
+    无法获取时返回空字典，由调用方用保留消息数代替
+    """
+    admin = get_admin()
+    if not hasattr(admin, 'describe_log_dirs'):
+        return {}
+
+    sizes = {}
+    try:
+        for broker in admin.describe_log_dirs(topic_partitions=list(topics)):
+            for log_dir in broker.get('log_dirs', []):
+                for topic in log_dir.get('topics', []):
+                    name = topic.get('name', topic.get('topic'))
+                    for partition in topic.get('partitions', []):
+                        key = (name, partition.get('partition_index', partition.get('partition')))
+                        sizes[key] = max(sizes.get(key, 0), partition.get('partition_size', partition.get('size', 0)))
+    except Exception as e:
+        print(f"⚠️ 无法获取分区大小，改用保留消息数: {str(e)}")
+        return {}
+    return sizes
+
+def recommend_partitions(current, produce_rate, consume_rates, lagging, partition_rate, headroom, brokers):
+    """
+    按写入速率计算需要的分区数: 写入速率 * 余量 / 单分区处理能力。
+    消费者已经落后时，单分区处理能力取实测的最大分区消费速率；分区数只能增加，增加时取broker数的整数倍。
+    返回 (建议分区数, 使用的单分区处理能力)
+    """
+    capacity = partition_rate
+    observed = max(consume_rates, default=0)
+    if lagging and 0 < observed < capacity:
+        capacity = observed
+
+    needed = math.ceil(produce_rate * headroom / capacity) if capacity > 0 else current
+    if needed <= current:
+        return current, capacity
+    return -(-needed // brokers) * brokers, capacity
+
+def plan_leader_balance(metadata, topics, loads):
+    """
+    在不改变副本集合(不迁移数据)的前提下重排每个分区的副本顺序，即调整首选leader。
+    按写入负载从大到小贪心分配，每个分区的leader选当前负载最低的副本所在broker，负载相同时选leader数少的。
+    返回 ({(topic, 分区): 新的副本列表}, {broker: 负载})
+    """
+    partitions = [(topic, p) for topic in topics for p in metadata.get(topic, [])]
+    brokers = sorted({broker for _, p in partitions for broker in p['replicas']})
+    broker_load = {broker: 0.0 for broker in brokers}
+    broker_leaders = {broker: 0 for broker in brokers}
+
+    assignment = {}
+    partitions.sort(key=lambda item: loads.get((item[0], item[1]['partition']), 0.0), reverse=True)
+    for topic, p in partitions:
+        replicas = p['replicas']
+        if not replicas:
+            continue
+        leader = min(replicas, key=lambda broker: (broker_load[broker], broker_leaders[broker], broker != replicas[0]))
+        broker_load[leader] += loads.get((topic, p['partition']), 0.0)
+        broker_leaders[leader] += 1
+        assignment[(topic, p['partition'])] = [leader] + [broker for broker in replicas if broker != leader]
+
+    return assignment, broker_load
+
+def _format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TB"
+
+def advise_partitions(topics, interval=10.0, partition_rate=1000.0, headroom=2.0, output=None,
+                      group_prefix=BRIDGE_GROUP_PREFIX):
+    """
+    采样各分区的写入/消费速率、leader分布和分区大小，给出分区数建议和leader重分配计划。
+    output 指定时写出 kafka-reassign-partitions.sh 格式的计划文件
+    """
+    print(f"🔍 采样 {interval:g}s 内的分区写入/消费速率...")
+    try:
+        first = sample_offsets(topics, group_prefix)
+        time.sleep(interval)
+        now, end_offsets, committed = sample_offsets(topics, group_prefix)
+        metadata = get_topic_metadata(refresh=True)
+        consumer = get_consumer('topic-manager-lag', group_id=None, enable_auto_commit=False)
+        beginning_offsets = consumer.beginning_offsets(list(end_offsets))
+    except Exception as e:
+        print(f"❌ 采样失败: {str(e)}")
+        return False
+    sizes = describe_partition_sizes(topics)
+
+    started, end_before, committed_before = first
+    elapsed = max(now - started, 1e-6)
+    brokers = sorted({broker for topic in topics for p in metadata.get(topic, []) for broker in p['replicas']})
+
+    loads = {}
+    for topic in topics:
+        partitions = metadata.get(topic, [])
+        if not partitions:
+            print(f"\n⚠️ topic不存在: {topic}")
+            continue
+
+        print(f"\n📊 {topic}")
+        print(f"  {'分区':>4} {'leader':>6} {'副本':>10} {'写入/s':>10} {'消费/s':>10} {'lag':>10} {'保留消息':>12} {'大小':>10}")
+
+        produce_rates, consume_rates, lag_before, lag_after = [], [], 0, 0
+        for p in partitions:
+            tp = TopicPartition(topic, p['partition'])
+            end = end_offsets.get(tp, 0)
+            produce_rate = (end - end_before.get(tp, end)) / elapsed
+            produce_rates.append(produce_rate)
+            loads[(topic, p['partition'])] = produce_rate
+
+            consume = '-'
+            lag = '-'
+            if tp in committed:
+                consume_rate = (committed[tp] - committed_before.get(tp, committed[tp])) / elapsed
+                consume_rates.append(consume_rate)
+                lag = max(end - committed[tp], 0)
+                lag_after += lag
+                lag_before += max(end_before.get(tp, end) - committed_before.get(tp, committed[tp]), 0)
+                consume = f"{consume_rate:.1f}"
+
+            retained = end - beginning_offsets.get(tp, 0)
+            size = _format_bytes(sizes[(topic, p['partition'])]) if (topic, p['partition']) in sizes else '-'
+            replicas = ','.join(str(broker) for broker in p['replicas'])
+            print(f"  {p['partition']:>6} {p['leader']:>6} {replicas:>10} {produce_rate:>11.1f} {consume:>11} "
+                  f"{lag:>10} {retained:>14} {size:>10}")
+
+        total_rate = sum(produce_rates)
+        mean_rate = total_rate / len(produce_rates)
+        hot = [p['partition'] for p, rate in zip(partitions, produce_rates) if mean_rate > 0 and rate > 1.5 * mean_rate]
+        lagging = lag_after > 0 and lag_after > lag_before
+        recommended, capacity = recommend_partitions(
+            len(partitions), total_rate, consume_rates, lagging, partition_rate, headroom, max(len(brokers), 1)
+        )
+
+        print(f"  写入合计: {total_rate:.1f}/s, 写入倾斜: {_skew(produce_rates):.2f}, lag: {lag_after}"
+              f"{' (增长中)' if lagging else ''}")
+        if hot:
+            print(f"  🔥 热点分区: {hot} (写入超过平均值的1.5倍，检查生产者的key或粘性分区策略)")
+        if recommended > len(partitions):
+            basis = "实测单分区消费" if capacity < partition_rate else "单分区"
+            print(f"  💡 建议分区数: {len(partitions)} -> {recommended} (按{basis} {capacity:.1f}/s、余量 {headroom:g}x 计算，"
+                  f"可通过 apply 的 partitions 字段增加)")
+        else:
+            print(f"  ✅ 分区数 {len(partitions)} 足够 (按单分区 {capacity:.1f}/s、余量 {headroom:g}x 计算)")
+
+    current_load = {broker: 0.0 for broker in brokers}
+    current_leaders = {broker: 0 for broker in brokers}
+    for topic in topics:
+        for p in metadata.get(topic, []):
+            if p['leader'] in current_load:
+                current_load[p['leader']] += loads.get((topic, p['partition']), 0.0)
+                current_leaders[p['leader']] += 1
+
+    assignment, planned_load = plan_leader_balance(metadata, topics, loads)
+    planned_leaders = {broker: 0 for broker in brokers}
+    for replicas in assignment.values():
+        planned_leaders[replicas[0]] += 1
+
+    print("\n🖥️ broker leader分布 (当前 -> 计划)")
+    for broker in brokers:
+        print(f"  broker {broker}: leader {current_leaders[broker]} -> {planned_leaders[broker]}, "
+              f"写入 {current_load[broker]:.1f}/s -> {planned_load[broker]:.1f}/s")
+    print(f"  写入负载倾斜: {_skew(list(current_load.values())):.2f} -> {_skew(list(planned_load.values())):.2f}")
+
+    changes, not_preferred = [], 0
+    for topic in topics:
+        for p in metadata.get(topic, []):
+            replicas = assignment.get((topic, p['partition']))
+            if replicas and replicas != p['replicas']:
+                changes.append({'topic': topic, 'partition': p['partition'], 'replicas': replicas})
+            if p['replicas'] and p['leader'] != p['replicas'][0]:
+                not_preferred += 1
+
+    if not changes:
+        print("✅ 首选leader已经均衡，无需重分配")
+    else:
+        print(f"📋 重分配计划: {len(changes)} 个分区调整首选leader (副本集合不变，无数据迁移)")
+        for change in changes:
+            print(f"  {change['topic']}-{change['partition']}: {change['replicas']}")
+    if not_preferred:
+        print(f"⚠️ {not_preferred} 个分区的leader不是首选副本，执行首选leader选举即可恢复")
+
+    if changes and output:
+        with open(output, 'w') as f:
+            json.dump({'version': 1, 'partitions': changes}, f, indent=2)
+        print(f"💾 计划已写入: {output}")
+        print(f"  执行: kafka-reassign-partitions.sh --bootstrap-server <broker> "
+              f"--reassignment-json-file {output} --execute")
+    if changes or not_preferred:
+        print("  之后: kafka-leader-election.sh --bootstrap-server <broker> --election-type PREFERRED "
+              "--all-topic-partitions")
+    return True
+
 def main():
     parser = argparse.ArgumentParser(description='Kafka Topic管理工具')
-    parser.add_argument('action', choices=['list', 'create', 'delete', 'ensure'], 
-                       help='操作类型: list(列出), create(创建), delete(删除), ensure(确保必需topics存在)')
+    parser.add_argument('action', choices=['list', 'create', 'delete', 'ensure', 'apply', 'lag', 'advise'], 
+                       help='操作类型: list(列出), create(创建), delete(删除), ensure(确保必需topics存在), '
+                            'apply(按声明文件批量同步), lag(消费组进度), advise(分区数和leader分布建议)')
     parser.add_argument('--topic', help='Topic名称 (create/delete时必需)')
+    parser.add_argument('--spec', help='topic声明文件 YAML/JSON (apply时必需)，参考 topics.example.yaml')
+    parser.add_argument('--dry-run', action='store_true', help='apply时只打印变更，不修改集群')
+    parser.add_argument('--interval', type=float, default=None, help='lag/advise的采样间隔(秒) (默认: lag 5, advise 10)')
+    parser.add_argument('--watch', action='store_true', help='lag持续刷新，直到Ctrl-C')
+    parser.add_argument('--group-prefix', default=BRIDGE_GROUP_PREFIX,
+                        help=f'lag的消费组前缀，消费组为 <前缀><topic> (默认: {BRIDGE_GROUP_PREFIX})')
+    parser.add_argument('--partition-rate', type=float, default=1000,
+                        help='advise时单分区可承担的消息数/秒 (默认: 1000)')
+    parser.add_argument('--headroom', type=float, default=2.0, help='advise时写入速率的余量倍数 (默认: 2.0)')
+    parser.add_argument('--output', help='advise时写出分区重分配计划 (kafka-reassign-partitions.sh 格式)')
     parser.add_argument('--partitions', type=int, default=6, help='分区数 (默认: 6)')
     parser.add_argument('--replication-factor', type=int, default=1, help='副本因子 (默认: 1)')
+    parser.add_argument('--profile', action='store_true', help='结束时打印连接建立与实际工作的耗时')
     
     args = parser.parse_args()
     
@@ -196,6 +617,27 @@ def main():
             
     elif args.action == 'ensure':
         ensure_required_topics()
+        
+    elif args.action == 'apply':
+        if not args.spec:
+            print("❌ apply需要指定 --spec 参数")
+            sys.exit(1)
+        if not apply_topic_spec(args.spec, args.dry_run):
+            sys.exit(1)
+            
+    elif args.action == 'lag':
+        topics = [args.topic] if args.topic else REQUIRED_TOPICS
+        if not show_lag(topics, args.interval or 5, args.watch, args.group_prefix):
+            sys.exit(1)
+            
+    elif args.action == 'advise':
+        topics = [args.topic] if args.topic else REQUIRED_TOPICS
+        if not advise_partitions(topics, args.interval or 10, args.partition_rate, args.headroom,
+                                 args.output, args.group_prefix):
+            sys.exit(1)
+    
+    if args.profile:
+        PROFILER.report()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
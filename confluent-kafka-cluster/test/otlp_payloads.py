@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+高吞吐OTLP测试负载生成器
+
+负载模板(OTLP JSON 或 otlp_proto)只序列化一次，每条消息只复制缓冲区并在固定位置改写
+时间戳、打点属性和traceId，不再为每条消息构造嵌套字典和调用json.dumps。
+批次形状为 N个resource × M条记录，属性基数和body长度可配置；
+预先生成多个模板变体轮流使用，让属性值在消息之间有变化。
+
+  JSON:  可变长度的值写成带引号的字符串，用引号外的空格补齐到固定宽度 (JSON允许任意空白)
+  proto: 时间戳是fixed64; 打点的int64写成补齐到10字节的varint (非最短编码，解码器均接受)
+
+单独运行时测试本机单核的生成速度:
+  python otlp_payloads.py --signal logs --encoding otlp_proto --resources 10 --records 100
+"""
+
+import json
+import time
+import uuid
+import random
+import string
+import struct
+import argparse
+from collections import namedtuple
+
+# 延迟打点: 每条消息的唯一ID和发送时刻 (墙上时钟 + 单调时钟)，写入日志/数据点/span的属性，
+# 由 otlp_sink.py 在链路末端读取并计算各段延迟
+STAMP_ID_KEY = 'test.id'
+STAMP_SENT_UNIX_KEY = 'test.sent_unix_nano'
+STAMP_SENT_MONOTONIC_KEY = 'test.sent_monotonic_ns'
+
+Stamp = namedtuple('Stamp', ['id', 'sent_unix_nano', 'sent_monotonic_ns'])
+
+def new_stamp():
+    return Stamp(uuid.uuid4().hex, time.time_ns(), time.monotonic_ns())
+
+def stamp_attributes(stamp):
+    """打点的OTLP属性列表"""
+    return [
+        {"key": STAMP_ID_KEY, "value": {"stringValue": stamp.id}},
+        {"key": STAMP_SENT_UNIX_KEY, "value": {"intValue": str(stamp.sent_unix_nano)}},
+        {"key": STAMP_SENT_MONOTONIC_KEY, "value": {"intValue": str(stamp.sent_monotonic_ns)}}
+    ]
+
+SIGNALS = ('logs', 'metrics', 'traces')
+ENCODINGS = ('json', 'otlp_proto')
+
+# 模板中需要改写的位置
+SLOT_START = 'start'            # 日志/数据点时间、span开始时间
+SLOT_END = 'end'                # span结束时间
+SLOT_STAMP_ID = 'stamp_id'
+SLOT_SENT_UNIX = 'sent_unix'
+SLOT_SENT_MONOTONIC = 'sent_monotonic'
+SLOT_TRACE_ID = 'trace_id'
+SLOTS = (SLOT_START, SLOT_END, SLOT_STAMP_ID, SLOT_SENT_UNIX, SLOT_SENT_MONOTONIC, SLOT_TRACE_ID)
+
+SPAN_DURATION_NS = 1_000_000
+
+# JSON中各位置的固定宽度 (含引号): 时间戳最多20位十进制数，ID为32位十六进制
+JSON_WIDTHS = {
+    SLOT_START: 22, SLOT_END: 22, SLOT_SENT_UNIX: 22, SLOT_SENT_MONOTONIC: 22,
+    SLOT_STAMP_ID: 34, SLOT_TRACE_ID: 34
+}
+
+# ---- 手写的protobuf编码 (只覆盖OTLP用到的线类型) ----
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def _padded_varint(value):
+    """固定10字节的varint，值变化时长度不变，可以原地改写"""
+    out = bytearray()
+    for _ in range(9):
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value & 0x7f)
+    return bytes(out)
+
+def _tag(field, wire_type):
+    return _varint(field << 3 | wire_type)
+
+def _ld(field, payload):
+    return _tag(field, 2) + _varint(len(payload)) + payload
+
+def _str(field, text):
+    return _ld(field, text.encode('utf-8'))
+
+def _uint(field, value):
+    return _tag(field, 0) + _varint(value)
+
+def _fixed64(field, raw):
+    return _tag(field, 1) + raw
+
+def _any_string(text):
+    return _str(1, text)
+
+def _key_value(field, key, any_value):
+    return _ld(field, _str(1, key) + _ld(2, any_value))
+
+# 各位置的proto占位值，序列化后按内容查找偏移
+PROTO_SENTINELS = {
+    SLOT_START: struct.pack('<Q', 0xFEFD5354415254A1),
+    SLOT_END: struct.pack('<Q', 0xFEFD454E4400A2A2),
+    SLOT_SENT_UNIX: _padded_varint(0x3ABCDEF012345671),
+    SLOT_SENT_MONOTONIC: _padded_varint(0x3ABCDEF012345672),
+    SLOT_STAMP_ID: b'#STAMPID#' + b'#' * 23,
+    SLOT_TRACE_ID: b'\xfe\xfdTRACEID\xfe\xfd\xfe\xfd\xfe\xfd\xfe'
+}
+
+def _json_sentinel(slot):
+    return ('~' + slot + '~').ljust(JSON_WIDTHS[slot] - 2, '~')
+
+class RecordShape:
+    """一个模板变体中每条记录的静态内容 (属性、body、名称)，JSON和proto共用"""
+
+    def __init__(self, rng, signal, index, body_size, attributes_per_record, cardinality):
+        self.attributes = [
+            (f'attr.{j}', f'value-{rng.randrange(cardinality)}') for j in range(attributes_per_record)
+        ]
+        self.body = ''.join(rng.choice(string.ascii_lowercase + ' ') for _ in range(body_size))
+        self.name = f'synthetic_{signal}_{index % max(cardinality, 1)}'
+        self.span_id = rng.getrandbits(64).to_bytes(8, 'big')
+        self.value = rng.randrange(1_000_000)
+
+class PayloadTemplate:
+    """一个已序列化的负载和其中各改写位置的偏移"""
+
+    def __init__(self, buffer, slots, encoding):
+        self.buffer = bytes(buffer)
+        self.encoding = encoding
+        self.slots = {slot: [] for slot in SLOTS}
+
+        for slot, sentinel in slots.items():
+            start = 0
+            while True:
+                offset = self.buffer.find(sentinel, start)
+                if offset < 0:
+                    break
+                self.slots[slot].append(offset)
+                start = offset + len(sentinel)
+
+    def render(self, stamp, trace_id):
+        buffer = bytearray(self.buffer)
+        for slot, value in self._slot_values(stamp, trace_id).items():
+            width = len(value)
+            for offset in self.slots[slot]:
+                buffer[offset:offset + width] = value
+        return bytes(buffer)
+
+    def _slot_values(self, stamp, trace_id):
+        start = stamp.sent_unix_nano
+        if self.encoding == 'json':
+            def quoted(text, slot):
+                return ('"' + text + '"').ljust(JSON_WIDTHS[slot]).encode()
+            return {
+                SLOT_START: quoted(str(start), SLOT_START),
+                SLOT_END: quoted(str(start + SPAN_DURATION_NS), SLOT_END),
+                SLOT_STAMP_ID: quoted(stamp.id, SLOT_STAMP_ID),
+                SLOT_SENT_UNIX: quoted(str(stamp.sent_unix_nano), SLOT_SENT_UNIX),
+                SLOT_SENT_MONOTONIC: quoted(str(stamp.sent_monotonic_ns), SLOT_SENT_MONOTONIC),
+                SLOT_TRACE_ID: quoted(trace_id.hex(), SLOT_TRACE_ID)
+            }
+        return {
+            SLOT_START: struct.pack('<Q', start),
+            SLOT_END: struct.pack('<Q', start + SPAN_DURATION_NS),
+            SLOT_STAMP_ID: stamp.id.encode(),
+            SLOT_SENT_UNIX: _padded_varint(stamp.sent_unix_nano),
+            SLOT_SENT_MONOTONIC: _padded_varint(stamp.sent_monotonic_ns),
+            SLOT_TRACE_ID: trace_id
+        }
+
+def _json_attributes(pairs):
+    return [{"key": key, "value": {"stringValue": value}} for key, value in pairs]
+
+def _json_stamp_attributes():
+    return [
+        {"key": STAMP_ID_KEY, "value": {"stringValue": _json_sentinel(SLOT_STAMP_ID)}},
+        {"key": STAMP_SENT_UNIX_KEY, "value": {"intValue": _json_sentinel(SLOT_SENT_UNIX)}},
+        {"key": STAMP_SENT_MONOTONIC_KEY, "value": {"intValue": _json_sentinel(SLOT_SENT_MONOTONIC)}}
+    ]
+
+def _build_json(signal, resources):
+    """resources: [(resource属性, [RecordShape])]，第一条记录带打点属性"""
+    scope_key, records_key, resource_key = {
+        'logs': ('scopeLogs', 'logRecords', 'resourceLogs'),
+        'metrics': ('scopeMetrics', 'metrics', 'resourceMetrics'),
+        'traces': ('scopeSpans', 'spans', 'resourceSpans')
+    }[signal]
+    start = _json_sentinel(SLOT_START)
+    items = []
+    first = True
+    for resource_attributes, records in resources:
+        entries = []
+        for shape in records:
+            attributes = _json_attributes(shape.attributes)
+            if first:
+                attributes = _json_stamp_attributes() + attributes
+                first = False
+
+            if signal == 'logs':
+                entries.append({
+                    "timeUnixNano": start,
+                    "severityNumber": 9,
+                    "severityText": "INFO",
+                    "body": {"stringValue": shape.body},
+                    "attributes": attributes
+                })
+            elif signal == 'metrics':
+                entries.append({
+                    "name": shape.name,
+                    "sum": {
+                        "dataPoints": [{
+                            "timeUnixNano": start,
+                            "asInt": str(shape.value),
+                            "attributes": attributes
+                        }],
+                        "aggregationTemporality": 2,
+                        "isMonotonic": True
+                    }
+                })
+            else:
+                entries.append({
+                    "traceId": _json_sentinel(SLOT_TRACE_ID),
+                    "spanId": shape.span_id.hex(),
+                    "name": shape.name,
+                    "kind": 2,
+                    "startTimeUnixNano": start,
+                    "endTimeUnixNano": _json_sentinel(SLOT_END),
+                    "attributes": attributes + [{"key": "message", "value": {"stringValue": shape.body}}]
+                })
+
+        items.append({
+            "resource": {"attributes": _json_attributes(resource_attributes)},
+            scope_key: [{"scope": {"name": "synthetic-generator"}, records_key: entries}]
+        })
+
+    payload = json.dumps({resource_key: items}, ensure_ascii=False, separators=(',', ':'))
+    # 占位字符串替换为同宽度的值后仍是合法JSON
+    return payload.encode('utf-8'), {slot: ('"' + _json_sentinel(slot) + '"').encode() for slot in SLOTS}
+
+def _proto_stamp_attributes(field):
+    return (
+        _key_value(field, STAMP_ID_KEY, _ld(1, PROTO_SENTINELS[SLOT_STAMP_ID]))
+        + _key_value(field, STAMP_SENT_UNIX_KEY, _tag(3, 0) + PROTO_SENTINELS[SLOT_SENT_UNIX])
+        + _key_value(field, STAMP_SENT_MONOTONIC_KEY, _tag(3, 0) + PROTO_SENTINELS[SLOT_SENT_MONOTONIC])
+    )
+
+def _build_proto(signal, resources):
+    """与_build_json相同的内容，按OTLP protobuf定义编码"""
+    start = PROTO_SENTINELS[SLOT_START]
+    out = bytearray()
+    first = True
+    for resource_attributes, records in resources:
+        entries = bytearray()
+        for shape in records:
+            if signal == 'logs':
+                # LogRecord: 1 time, 2 severity_number, 3 severity_text, 5 body, 6 attributes
+                record = _fixed64(1, start) + _uint(2, 9) + _str(3, 'INFO') + _ld(5, _any_string(shape.body))
+                if first:
+                    record += _proto_stamp_attributes(6)
+                for key, value in shape.attributes:
+                    record += _key_value(6, key, _any_string(value))
+                entries += _ld(2, record)
+
+            elif signal == 'metrics':
+                # NumberDataPoint: 3 time, 6 as_int(sfixed64), 7 attributes
+                point = _fixed64(3, start) + _tag(6, 1) + struct.pack('<q', shape.value)
+                if first:
+                    point += _proto_stamp_attributes(7)
+                for key, value in shape.attributes:
+                    point += _key_value(7, key, _any_string(value))
+                # Sum: 1 data_points, 2 aggregation_temporality, 3 is_monotonic; Metric: 1 name, 7 sum
+                metric_sum = _ld(1, point) + _uint(2, 2) + _uint(3, 1)
+                entries += _ld(2, _str(1, shape.name) + _ld(7, metric_sum))
+
+            else:
+                # Span: 1 trace_id, 2 span_id, 5 name, 6 kind, 7 start, 8 end, 9 attributes
+                span = (_ld(1, PROTO_SENTINELS[SLOT_TRACE_ID]) + _ld(2, shape.span_id) + _str(5, shape.name)
+                        + _uint(6, 2) + _fixed64(7, start) + _fixed64(8, PROTO_SENTINELS[SLOT_END]))
+                if first:
+                    span += _proto_stamp_attributes(9)
+                for key, value in shape.attributes:
+                    span += _key_value(9, key, _any_string(value))
+                span += _key_value(9, 'message', _any_string(shape.body))
+                entries += _ld(2, span)
+            first = False
+
+        resource = b''.join(_key_value(1, key, _any_string(value)) for key, value in resource_attributes)
+        # Resource*: 1 resource, 2 scope_*; Scope*: 1 scope(1 name), 2 records
+        scope = _ld(1, _str(1, 'synthetic-generator')) + bytes(entries)
+        out += _ld(1, _ld(1, resource) + _ld(2, scope))
+
+    return out, PROTO_SENTINELS
+
+class PayloadGenerator:
+    """
+    按固定形状生成OTLP负载: resources个resource，每个resource包含records条记录
+    (日志/指标数据点/span)。每次 next() 只复制模板并改写时间戳、打点和traceId
+    """
+
+    def __init__(self, signal='logs', encoding='json', resources=1, records=1, body_size=64,
+                 attributes_per_record=3, cardinality=10, variants=8, seed=0):
+        if signal not in SIGNALS:
+            raise ValueError(f"不支持的信号类型: {signal}")
+        if encoding not in ENCODINGS:
+            raise ValueError(f"不支持的编码: {encoding}")
+
+        self.signal = signal
+        self.encoding = encoding
+        self.records_per_payload = resources * records
+        self.templates = []
+        self.index = 0
+
+        rng = random.Random(seed)
+        build = _build_json if encoding == 'json' else _build_proto
+        for _ in range(variants):
+            shapes = [
+                ([('service.name', f'synthetic-service-{r}'),
+                  ('service.instance.id', f'instance-{rng.randrange(cardinality)}')],
+                 [RecordShape(rng, signal, i, body_size, attributes_per_record, cardinality) for i in range(records)])
+                for r in range(resources)
+            ]
+            buffer, sentinels = build(signal, shapes)
+            self.templates.append(PayloadTemplate(buffer, sentinels, encoding))
+
+    def next(self, stamp=None):
+        """返回下一条负载 (bytes)，stamp为None时生成新的打点"""
+        stamp = stamp or new_stamp()
+        template = self.templates[self.index]
+        self.index = (self.index + 1) % len(self.templates)
+        # traceId沿用打点ID (同为16字节)，每条消息一个trace
+        return template.render(stamp, bytes.fromhex(stamp.id))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='OTLP负载生成速度测试 (单核)')
+    parser.add_argument('--signal', choices=SIGNALS, default='logs', help='信号类型 (默认: logs)')
+    parser.add_argument('--encoding', choices=ENCODINGS, default='json', help='编码 (默认: json)')
+    parser.add_argument('--resources', type=int, default=1, help='每条消息的resource数 (默认: 1)')
+    parser.add_argument('--records', type=int, default=100, help='每个resource的记录数 (默认: 100)')
+    parser.add_argument('--body-size', type=int, default=64, help='日志body/span消息长度 (默认: 64)')
+    parser.add_argument('--attributes', type=int, default=3, help='每条记录的属性数 (默认: 3)')
+    parser.add_argument('--cardinality', type=int, default=10, help='每个属性的取值个数 (默认: 10)')
+    parser.add_argument('--seconds', type=float, default=5, help='测试时长(秒) (默认: 5)')
+    parser.add_argument('--show', action='store_true', help='打印一条生成的负载')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    generator = PayloadGenerator(
+        args.signal, args.encoding, args.resources, args.records, args.body_size,
+        args.attributes, args.cardinality
+    )
+
+    if args.show:
+        payload = generator.next()
+        print(payload.decode('utf-8') if args.encoding == 'json' else payload.hex())
+        return
+
+    print(f"⚙️ 生成 {args.signal}/{args.encoding}: {args.resources} resources × {args.records} 条记录")
+    count = size = 0
+    started = time.perf_counter()
+    deadline = started + args.seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            size += len(generator.next())
+        count += 100
+    elapsed = time.perf_counter() - started
+
+    print(f"📊 {count / elapsed:,.0f} 条消息/s, {count * generator.records_per_payload / elapsed:,.0f} 条记录/s, "
+          f"{size / elapsed / 1024 / 1024:.1f} MB/s (平均 {size // count} 字节/消息)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+本地OTLP HTTP接收端 - 端到端延迟测量
+
+替代真实的OTLP后端接收 collector/bridge 导出的数据，读取 local_kafka_test.py 写入的延迟打点
+(test.id / test.sent_unix_nano / test.sent_monotonic_ns)，计算各段延迟分布:
+  total      发送 → 本接收端
+  kafka_ack  发送 → Kafka ack       (需要 --producer-trace)
+  pipeline   Kafka ack → 本接收端   (需要 --producer-trace，包含消费、collector/bridge处理和导出)
+
+用法:
+  python otlp_sink.py --port 4318 --producer-trace trace.ndjson --expect 6000 --slo-p99-ms 500
+  python local_kafka_test.py load --rate 200 --duration 30 --trace-file trace.ndjson
+
+支持 JSON 和 protobuf 编码 (protobuf按线格式直接查找打点属性，不依赖opentelemetry-proto)，
+以及 gzip / zstd (需要zstandard包) 请求压缩。同一ID重复到达时按重复投递计数，只统计第一次
+"""
+
+import sys
+import gzip
+import json
+import math
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from otlp_payloads import STAMP_ID_KEY, STAMP_SENT_UNIX_KEY, STAMP_SENT_MONOTONIC_KEY
+
+STAMP_KEYS = (STAMP_ID_KEY, STAMP_SENT_UNIX_KEY, STAMP_SENT_MONOTONIC_KEY)
+STAMP_KEYS_BYTES = tuple(key.encode() for key in STAMP_KEYS)
+
+SIGNAL_PATHS = {
+    '/v1/logs': 'logs',
+    '/v1/metrics': 'metrics',
+    '/v1/traces': 'traces'
+}
+
+HOPS = ('total', 'kafka_ack', 'pipeline')
+
+# 嵌套层数上限 (ExportLogsServiceRequest → ResourceLogs → ScopeLogs → LogRecord → KeyValue → AnyValue)
+MAX_PROTO_DEPTH = 8
+
+def percentile(sorted_values, pct):
+    """按最近秩法计算百分位 (sorted_values 需已排序)"""
+    if not sorted_values:
+        return 0.0
+    rank = int(math.ceil(pct / 100.0 * len(sorted_values))) - 1
+    return sorted_values[min(max(rank, 0), len(sorted_values) - 1)]
+
+def _read_varint(data, pos):
+    result = shift = 0
+    while True:
+        if pos >= len(data) or shift > 63:
+            raise ValueError("varint越界")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+def _parse_fields(data):
+    """把protobuf消息解析为 [(字段号, 线类型, 值)]，不是合法消息时抛出ValueError"""
+    fields = []
+    pos = 0
+    while pos < len(data):
+        key, pos = _read_varint(data, pos)
+        number, wire_type = key >> 3, key & 7
+        if number == 0:
+            raise ValueError("字段号为0")
+
+        if wire_type == 0:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire_type == 2:
+            length, pos = _read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        elif wire_type == 5:
+            value, pos = data[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f"不支持的线类型 {wire_type}")
+
+        if pos > len(data):
+            raise ValueError("字段越界")
+        fields.append((number, wire_type, value))
+    return fields
+
+def _proto_attribute(data):
+    """data是打点属性的KeyValue (1=key, 2=AnyValue{1=string_value, 3=int_value}) 时返回 (key, value)"""
+    try:
+        fields = _parse_fields(data)
+        if len(fields) != 2 or fields[0][:2] != (1, 2) or fields[1][:2] != (2, 2):
+            return None
+        if fields[0][2] not in STAMP_KEYS_BYTES:
+            return None
+
+        for number, wire_type, value in _parse_fields(fields[1][2]):
+            if number == 1 and wire_type == 2:
+                return fields[0][2].decode(), value.decode()
+            if number == 3 and wire_type == 0:
+                return fields[0][2].decode(), value
+    except (ValueError, UnicodeDecodeError):
+        pass
+    return None
+
+def find_proto_stamps(data, found, depth=0):
+    """递归查找protobuf负载中带打点属性的条目 (LogRecord/NumberDataPoint/Span)"""
+    if depth > MAX_PROTO_DEPTH:
+        return
+    try:
+        fields = _parse_fields(data)
+    except ValueError:
+        # bridge以字符串body转发的JSON消息
+        if b'"' + STAMP_KEYS_BYTES[0] + b'"' in data:
+            try:
+                find_json_stamps(json.loads(data), found)
+            except ValueError:
+                pass
+        return
+
+    stamp = {}
+    children = []
+    for _number, wire_type, value in fields:
+        if wire_type != 2 or not value:
+            continue
+        attribute = _proto_attribute(value)
+        if attribute:
+            stamp[attribute[0]] = attribute[1]
+        else:
+            children.append(value)
+
+    if STAMP_ID_KEY in stamp:
+        found.append(stamp)
+    for child in children:
+        find_proto_stamps(child, found, depth + 1)
+
+def find_json_stamps(node, found):
+    """递归查找OTLP JSON负载中带打点属性的条目"""
+    if isinstance(node, dict):
+        attributes = node.get('attributes')
+        if isinstance(attributes, list):
+            stamp = {}
+            for kv in attributes:
+                if isinstance(kv, dict) and kv.get('key') in STAMP_KEYS:
+                    value = kv.get('value') or {}
+                    stamp[kv['key']] = value.get('stringValue', value.get('intValue'))
+            if STAMP_ID_KEY in stamp:
+                found.append(stamp)
+        for value in node.values():
+            find_json_stamps(value, found)
+
+    elif isinstance(node, list):
+        for item in node:
+            find_json_stamps(item, found)
+
+    elif isinstance(node, str) and STAMP_ID_KEY in node:
+        # bridge以字符串body转发的JSON消息
+        try:
+            find_json_stamps(json.loads(node), found)
+        except ValueError:
+            pass
+
+class ProducerTrace:
+    """增量读取 local_kafka_test.py --trace-file 写入的ack记录"""
+
+    def __init__(self, path, clock):
+        self.path = path
+        self.clock = clock
+        self.position = 0
+        self.acked = {}
+
+    def refresh(self):
+        try:
+            with open(self.path) as f:
+                f.seek(self.position)
+                for line in f:
+                    if not line.endswith('\n'):
+                        break  # 写入方尚未写完的行，下次再读
+                    self.position += len(line.encode('utf-8'))
+                    record = json.loads(line)
+                    self.acked[record['id']] = record[f'acked_{self.clock}']
+        except FileNotFoundError:
+            pass
+        return self.acked
+
+class LatencyRecorder:
+    """按信号类型记录每个打点ID的发送和到达时刻，报告时与producer的ack记录关联"""
+
+    def __init__(self, clock, producer_trace=None):
+        self.lock = threading.Lock()
+        self.clock = clock
+        self.sent_key = STAMP_SENT_UNIX_KEY if clock == 'unix_nano' else STAMP_SENT_MONOTONIC_KEY
+        self.trace = ProducerTrace(producer_trace, clock) if producer_trace else None
+        self.samples = {}
+        self.seen = set()
+        self.duplicates = 0
+        self.requests = 0
+
+    def now(self):
+        return time.time_ns() if self.clock == 'unix_nano' else time.monotonic_ns()
+
+    def record(self, signal, stamps):
+        received = self.now()
+        with self.lock:
+            self.requests += 1
+            for stamp in stamps:
+                stamp_id = stamp[STAMP_ID_KEY]
+                if stamp_id in self.seen:
+                    self.duplicates += 1
+                    continue
+                self.seen.add(stamp_id)
+                self.samples.setdefault(signal, []).append((stamp_id, int(stamp[self.sent_key]), received))
+
+    @property
+    def received(self):
+        return len(self.seen)
+
+    def summary(self):
+        """返回 {信号: {hop: {count, p50, p95, p99, max} (毫秒)}}，all 为所有信号合计"""
+        acked = self.trace.refresh() if self.trace else {}
+        with self.lock:
+            samples = {signal: list(values) for signal, values in self.samples.items()}
+
+        hops = {}
+        for signal, values in samples.items():
+            for stamp_id, sent, received in values:
+                latencies = [('total', received - sent)]
+                ack = acked.get(stamp_id)
+                if ack is not None:
+                    latencies += [('kafka_ack', ack - sent), ('pipeline', received - ack)]
+                for hop, ns in latencies:
+                    hops.setdefault(signal, {}).setdefault(hop, []).append(ns / 1e6)
+                    hops.setdefault('all', {}).setdefault(hop, []).append(ns / 1e6)
+
+        summary = {}
+        for signal, by_hop in hops.items():
+            for hop, values in by_hop.items():
+                values.sort()
+                summary.setdefault(signal, {})[hop] = {
+                    'count': len(values),
+                    'p50': percentile(values, 50),
+                    'p95': percentile(values, 95),
+                    'p99': percentile(values, 99),
+                    'max': values[-1]
+                }
+        return summary
+
+def print_report(recorder, elapsed):
+    summary = recorder.summary()
+    print(f"\n📊 端到端延迟 (运行 {elapsed:.0f}s, 请求: {recorder.requests}, "
+          f"消息: {recorder.received}, 重复: {recorder.duplicates})")
+    header = f"  {'signal':<8} {'hop':<10} {'count':>8} {'p50':>10} {'p95':>10} {'p99':>10} {'max':>10}"
+    print(header)
+    print("  " + "-" * (len(header) - 2))
+
+    for signal in sorted(summary, key=lambda s: (s == 'all', s)):
+        for hop in HOPS:
+            stats = summary[signal].get(hop)
+            if stats:
+                print(f"  {signal:<8} {hop:<10} {stats['count']:>8} {stats['p50']:>8.1f}ms {stats['p95']:>8.1f}ms "
+                      f"{stats['p99']:>8.1f}ms {stats['max']:>8.1f}ms")
+    return summary
+
+def make_handler(recorder):
+    class OTLPHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            signal = SIGNAL_PATHS.get(self.path)
+            if signal is None:
+                self.send_error(404)
+                return
+
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            encoding = self.headers.get('Content-Encoding')
+            if encoding == 'gzip':
+                body = gzip.decompress(body)
+            elif encoding == 'zstd':
+                if zstandard is None:
+                    self.send_error(415, "zstd需要安装zstandard")
+                    return
+                body = zstandard.ZstdDecompressor().decompressobj().decompress(body)
+
+            stamps = []
+            is_json = 'json' in self.headers.get('Content-Type', '')
+            try:
+                if is_json:
+                    find_json_stamps(json.loads(body), stamps)
+                else:
+                    find_proto_stamps(body, stamps)
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
+            recorder.record(signal, stamps)
+
+            # 空的 Export*ServiceResponse 在两种编码下都是合法的成功响应
+            response = b'{}' if is_json else b''
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json' if is_json else 'application/x-protobuf')
+            self.send_header('Content-Length', str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def log_message(self, format, *args):
+            pass
+
+    return OTLPHandler
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='本地OTLP HTTP接收端 (端到端延迟测量)')
+    parser.add_argument('--host', default='0.0.0.0', help='监听地址 (默认: 0.0.0.0)')
+    parser.add_argument('--port', type=int, default=4318, help='监听端口 (默认: 4318)')
+    parser.add_argument('--producer-trace', help='local_kafka_test.py --trace-file 的输出，用于拆分各段延迟')
+    parser.add_argument('--clock', choices=['unix_nano', 'monotonic_ns'], default='unix_nano',
+                        help='计算延迟的时钟: unix_nano(墙上时钟，跨主机需NTP同步), '
+                             'monotonic_ns(单调时钟，仅限与发送端同一主机)')
+    parser.add_argument('--duration', type=float, help='运行时长(秒)，默认一直运行到Ctrl-C')
+    parser.add_argument('--expect', type=int, help='收到这么多条不同的消息后结束')
+    parser.add_argument('--report-interval', type=float, default=10, help='中间报告间隔(秒) (默认: 10)')
+    parser.add_argument('--slo-p99-ms', type=float, help='total p99 超过该值时以非0状态退出')
+    parser.add_argument('--output', help='把最终结果写入该JSON文件')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    recorder = LatencyRecorder(args.clock, args.producer_trace)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(recorder))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    print("🚀 OTLP延迟测量接收端")
+    print(f"监听: http://{args.host}:{args.port} (/v1/logs /v1/metrics /v1/traces), 时钟: {args.clock}")
+    print("=" * 40)
+
+    started = time.monotonic()
+    next_report = started + args.report_interval
+    try:
+        while True:
+            time.sleep(0.2)
+            now = time.monotonic()
+            if args.duration and now - started >= args.duration:
+                break
+            if args.expect and recorder.received >= args.expect:
+                break
+            if now >= next_report:
+                print_report(recorder, now - started)
+                next_report = now + args.report_interval
+    except KeyboardInterrupt:
+        print("\n⏹️ 收到停止信号")
+    finally:
+        server.shutdown()
+
+    summary = print_report(recorder, time.monotonic() - started)
+    if args.expect and recorder.received < args.expect:
+        print(f"⚠️ 只收到 {recorder.received}/{args.expect} 条消息")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'received': recorder.received,
+                'duplicates': recorder.duplicates,
+                'requests': recorder.requests,
+                'latency_ms': summary
+            }, f, indent=2)
+        print(f"📝 结果已写入: {args.output}")
+
+    if args.slo_p99_ms is not None:
+        p99 = summary.get('all', {}).get('total', {}).get('p99')
+        if p99 is None or p99 > args.slo_p99_ms:
+            actual = f"{p99:.1f}ms" if p99 is not None else "无数据"
+            print(f"❌ 未达到SLO: total p99 = {actual} > {args.slo_p99_ms}ms")
+            sys.exit(1)
+        print(f"✅ 达到SLO: total p99 = {p99:.1f}ms <= {args.slo_p99_ms}ms")
+
+if __name__ == "__main__":
+    main()
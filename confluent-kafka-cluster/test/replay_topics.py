@@ -0,0 +1,599 @@
+#!/usr/bin/env python3
+"""
+Kafka时间窗口导出/重放脚本 - 用于事故时间段的排查和重新投递
+
+export  按时间戳查找每个分区在时间窗口内的offset范围 (offsets_for_times)，由多个线程各自的消费者
+        并行读取所有分区，每个分区写一个文件:
+          ndjson   每行一条消息 (可gzip压缩)，可直接作为 bridge_bench.py --input
+          segment  长度前缀的二进制记录，附带稀疏的 offset/时间戳 索引文件，重放时可按时间快速定位
+        导出目录中的 manifest.json 记录时间窗口、每个分区的offset范围和文件
+replay  按时间戳顺序合并各分区的导出文件，以 --rate 控制的速率重新写入 (原topic或 --topic-map 指定的topic)
+
+用法:
+  python replay_topics.py export --start -30m --output-dir incident-0612
+  python replay_topics.py export --start 2024-06-12T08:00:00Z --end 2024-06-12T08:15:00Z --format segment --output-dir incident-0612
+  python replay_topics.py replay --input-dir incident-0612 --topic-map otcol_logs=otcol_logs_replay --rate 500
+
+时间可以是ISO 8601 (不带时区时按本地时间)、毫秒时间戳、now，或相对当前时间的 -30s/-15m/-2h/-1d
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import heapq
+import base64
+import struct
+import argparse
+import threading
+from datetime import datetime
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from kafka import TopicPartition
+
+from kafka_clients import KAFKA_BROKERS, PROFILER, create_consumer, create_producer
+
+REQUIRED_TOPICS = ["otcol_logs", "otcol_metrics", "otcol_traces"]
+
+FORMATS = ('ndjson', 'segment')
+MANIFEST_FILE = 'manifest.json'
+
+# 进度输出间隔(秒)
+PROGRESS_INTERVAL_S = 5
+
+# segment文件: 文件头 + 每条记录 [offset, 时间戳, key长度, value长度, headers长度] + key + value + headers。
+# 长度为-1表示None，headers为JSON编码的 [[key, base64值]]
+SEGMENT_MAGIC = b'KSEG\x01'
+RECORD_HEADER = struct.Struct('>qqiii')
+# 索引项: [offset, 截止该记录的最大时间戳, 记录在segment文件中的位置]
+INDEX_ENTRY = struct.Struct('>qqq')
+
+# 导出文件中的一条消息
+ReplayRecord = namedtuple('ReplayRecord', ['topic', 'partition', 'offset', 'timestamp', 'key', 'value', 'headers'])
+
+RELATIVE_TIME = re.compile(r'^-(\d+(?:\.\d+)?)([smhd])$')
+RELATIVE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+def parse_time(value):
+    """把命令行的时间参数转换为毫秒时间戳"""
+    now_ms = int(time.time() * 1000)
+    if value == 'now':
+        return now_ms
+
+    match = RELATIVE_TIME.match(value)
+    if match:
+        return now_ms - int(float(match.group(1)) * RELATIVE_UNITS[match.group(2)] * 1000)
+
+    if value.isdigit():
+        return int(value)
+
+    # Python 3.9 的 fromisoformat 不支持 Z 后缀
+    return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp() * 1000)
+
+def format_time(timestamp_ms):
+    return datetime.fromtimestamp(timestamp_ms / 1000).strftime('%Y-%m-%d %H:%M:%S')
+
+def partition_filename(topic, partition, fmt, compression):
+    if fmt == 'segment':
+        return f'{topic}-{partition}.seg'
+    return f'{topic}-{partition}.ndjson' + ('.gz' if compression == 'gzip' else '')
+
+def index_filename(topic, partition):
+    return f'{topic}-{partition}.idx'
+
+def _put_bytes(entry, name, data):
+    # 可按UTF-8解码的内容保存为文本，便于直接查看；否则保存为base64
+    if data is None:
+        return
+    try:
+        entry[name] = data.decode('utf-8')
+    except UnicodeDecodeError:
+        entry[name + '_b64'] = base64.b64encode(data).decode('ascii')
+
+def _get_bytes(entry, name):
+    if name in entry:
+        return entry[name].encode('utf-8')
+    if name + '_b64' in entry:
+        return base64.b64decode(entry[name + '_b64'])
+    return None
+
+def _encode_headers(headers):
+    return [[key, base64.b64encode(value or b'').decode('ascii')] for key, value in headers or []]
+
+def _decode_headers(headers):
+    return [(key, base64.b64decode(value)) for key, value in headers or []]
+
+class NdjsonWriter:
+    """NDJSON导出文件，行格式与 bridge_bench.py --input 一致。按1MB分块写入，gzip压缩在写入线程中进行"""
+
+    FLUSH_BYTES = 1 << 20
+
+    def __init__(self, path, compression='gzip', level=1):
+        if compression == 'gzip':
+            self.file = gzip.open(path, 'wb', compresslevel=level)
+        else:
+            self.file = open(path, 'wb')
+        self.pending = []
+        self.pending_bytes = 0
+        self.records = 0
+        self.bytes = 0
+
+    def write(self, record):
+        entry = {'topic': record.topic, 'partition': record.partition, 'offset': record.offset,
+                 'timestamp': record.timestamp}
+        _put_bytes(entry, 'key', record.key)
+        _put_bytes(entry, 'value', record.value)
+        if record.headers:
+            entry['headers'] = _encode_headers(record.headers)
+
+        line = (json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        self.pending.append(line)
+        self.pending_bytes += len(line)
+        self.records += 1
+        self.bytes += len(record.value or b'')
+        if self.pending_bytes >= self.FLUSH_BYTES:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.file.write(b''.join(self.pending))
+            self.pending = []
+            self.pending_bytes = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+class SegmentWriter:
+    """长度前缀的二进制segment文件，每 index_interval 条记录写一个索引项 (第一条记录总是有索引项)"""
+
+    def __init__(self, path, index_path, index_interval=1000):
+        self.file = open(path, 'wb', buffering=1 << 20)
+        self.file.write(SEGMENT_MAGIC)
+        self.position = len(SEGMENT_MAGIC)
+        self.index = open(index_path, 'wb')
+        self.index_interval = index_interval
+        self.max_timestamp = -1
+        self.records = 0
+        self.bytes = 0
+
+    def write(self, record):
+        key, value = record.key, record.value
+        headers = json.dumps(_encode_headers(record.headers)).encode('utf-8') if record.headers else None
+        parts = [RECORD_HEADER.pack(
+            record.offset, record.timestamp,
+            -1 if key is None else len(key), -1 if value is None else len(value), -1 if headers is None else len(headers)
+        )]
+        parts.extend(data for data in (key, value, headers) if data)
+        data = b''.join(parts)
+
+        self.max_timestamp = max(self.max_timestamp, record.timestamp)
+        if self.records % self.index_interval == 0:
+            self.index.write(INDEX_ENTRY.pack(record.offset, self.max_timestamp, self.position))
+
+        self.file.write(data)
+        self.position += len(data)
+        self.records += 1
+        self.bytes += len(value or b'')
+
+    def close(self):
+        self.file.close()
+        self.index.close()
+
+def read_index(path):
+    """读取segment索引: [(offset, 最大时间戳, 位置)]"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return [INDEX_ENTRY.unpack_from(data, i) for i in range(0, len(data), INDEX_ENTRY.size)]
+
+def seek_position(index, start_ms):
+    """返回时间窗口开始前可以直接跳过的位置: 最后一个最大时间戳仍小于 start_ms 的索引项"""
+    position = len(SEGMENT_MAGIC)
+    for _, max_timestamp, entry_position in index:
+        if max_timestamp >= start_ms:
+            break
+        position = entry_position
+    return position
+
+def iter_segment(path, topic, partition, position=None):
+    with open(path, 'rb', buffering=1 << 20) as f:
+        if f.read(len(SEGMENT_MAGIC)) != SEGMENT_MAGIC:
+            raise ValueError(f"不是segment文件: {path}")
+        if position is not None:
+            f.seek(position)
+
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            offset, timestamp, key_size, value_size, headers_size = RECORD_HEADER.unpack(header)
+            key = f.read(key_size) if key_size >= 0 else None
+            value = f.read(value_size) if value_size >= 0 else None
+            headers = _decode_headers(json.loads(f.read(headers_size))) if headers_size >= 0 else []
+            yield ReplayRecord(topic, partition, offset, timestamp, key, value, headers)
+
+def iter_ndjson(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            yield ReplayRecord(
+                entry['topic'], entry['partition'], entry['offset'], entry['timestamp'],
+                _get_bytes(entry, 'key'), _get_bytes(entry, 'value'), _decode_headers(entry.get('headers'))
+            )
+
+def iter_partition(export_dir, manifest, entry, start_ms=None, end_ms=None):
+    """按文件顺序读取一个分区的导出记录，只保留 [start_ms, end_ms) 内的记录"""
+    path = os.path.join(export_dir, entry['file'])
+    if manifest['format'] == 'segment':
+        position = None
+        if start_ms is not None:
+            position = seek_position(read_index(os.path.join(export_dir, entry['index'])), start_ms)
+        records = iter_segment(path, entry['topic'], entry['partition'], position)
+    else:
+        records = iter_ndjson(path)
+
+    for record in records:
+        if start_ms is not None and record.timestamp < start_ms:
+            continue
+        if end_ms is not None and record.timestamp >= end_ms:
+            continue
+        yield record
+
+class Progress:
+    """多个导出/重放线程共享的进度计数"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.records = 0
+        self.bytes = 0
+
+    def add(self, records, size):
+        with self.lock:
+            self.records += records
+            self.bytes += size
+
+    def report(self, label, total=None):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        done = f"{self.records}/{total}" if total else f"{self.records}"
+        print(f"  ⏳ {label} {done} 条, {self.bytes / 1024 / 1024:.1f}MB "
+              f"({self.records / elapsed:.0f} 条/s, {self.bytes / 1024 / 1024 / elapsed:.1f}MB/s)")
+
+def resolve_offsets(consumer, topics, start_ms, end_ms):
+    """
+    通过时间戳查找每个分区在 [start_ms, end_ms) 内的offset范围: {TopicPartition: (起始offset, 结束offset)}。
+    没有晚于时间戳的消息时 offsets_for_times 返回None，此时使用分区的end offset
+    """
+    partitions = []
+    for topic in topics:
+        found = consumer.partitions_for_topic(topic)
+        if not found:
+            print(f"⚠️ topic不存在: {topic}")
+            continue
+        partitions.extend(TopicPartition(topic, p) for p in sorted(found))
+
+    end_offsets = consumer.end_offsets(partitions)
+    starts = consumer.offsets_for_times({tp: start_ms for tp in partitions})
+    ends = consumer.offsets_for_times({tp: end_ms for tp in partitions})
+
+    ranges = {}
+    for tp in partitions:
+        start = starts[tp].offset if starts.get(tp) else end_offsets[tp]
+        end = ends[tp].offset if ends.get(tp) else end_offsets[tp]
+        ranges[tp] = (start, max(start, end))
+    return ranges
+
+def assign_workers(ranges, workers):
+    """按记录数把分区分配给线程，每次分给当前负载最小的线程"""
+    loads = [(0, i, []) for i in range(workers)]
+    for tp, (start, end) in sorted(ranges.items(), key=lambda item: item[1][0] - item[1][1]):  # 消息多的分区先分配
+        if end <= start:
+            continue
+        load, i, assigned = heapq.heappop(loads)
+        assigned.append(tp)
+        heapq.heappush(loads, (load + end - start, i, assigned))
+    return [assigned for _, _, assigned in sorted(loads, key=lambda item: item[1]) if assigned]
+
+def open_writer(output_dir, tp, fmt, compression, level, index_interval):
+    path = os.path.join(output_dir, partition_filename(tp.topic, tp.partition, fmt, compression))
+    if fmt == 'segment':
+        return SegmentWriter(path, os.path.join(output_dir, index_filename(tp.topic, tp.partition)), index_interval)
+    return NdjsonWriter(path, compression, level)
+
+def export_worker(worker_id, partitions, ranges, options, progress, stop):
+    """
+    一个导出线程: 使用独立的消费者assign自己的分区并seek到起始offset，
+    分区读到结束offset后暂停，避免继续拉取窗口之后的数据
+    """
+    consumer = create_consumer(
+        f'replay-export-{worker_id}', options.bootstrap,
+        group_id=None, enable_auto_commit=False,
+        max_partition_fetch_bytes=8 * 1024 * 1024, fetch_max_bytes=64 * 1024 * 1024
+    )
+    writers = {tp: open_writer(options.output_dir, tp, options.format, options.compression, options.level,
+                               options.index_interval) for tp in partitions}
+    remaining = set(partitions)
+    complete = True
+    try:
+        consumer.assign(partitions)
+        for tp in partitions:
+            consumer.seek(tp, ranges[tp][0])
+
+        last_data = time.monotonic()
+        while remaining and not stop.is_set():
+            records = consumer.poll(timeout_ms=500, max_records=5000)
+            for tp, messages in records.items():
+                end = ranges[tp][1]
+                writer = writers[tp]
+                count, size = writer.records, writer.bytes
+                for message in messages:
+                    if message.offset >= end:
+                        break
+                    writer.write(ReplayRecord(
+                        tp.topic, tp.partition, message.offset, message.timestamp,
+                        message.key, message.value, message.headers
+                    ))
+                progress.add(writer.records - count, writer.bytes - size)
+            if records:
+                last_data = time.monotonic()
+
+            # 事务标记和压缩(compaction)会留下offset空洞，以消费位置判断是否读完
+            finished = [tp for tp in remaining if consumer.position(tp) >= ranges[tp][1]]
+            if finished:
+                consumer.pause(*finished)
+                remaining.difference_update(finished)
+
+            if remaining and time.monotonic() - last_data > options.idle_timeout:
+                print(f"  ⚠️ 线程 {worker_id}: {options.idle_timeout:g}s 内没有读到数据，放弃 {len(remaining)} 个分区")
+                break
+
+        complete = not remaining
+    finally:
+        for writer in writers.values():
+            writer.close()
+        consumer.close()
+
+    return [{
+        'topic': tp.topic,
+        'partition': tp.partition,
+        'start_offset': ranges[tp][0],
+        'end_offset': ranges[tp][1],
+        'records': writers[tp].records,
+        'bytes': writers[tp].bytes,
+        'complete': tp not in remaining,
+        'file': partition_filename(tp.topic, tp.partition, options.format, options.compression),
+        'index': index_filename(tp.topic, tp.partition) if options.format == 'segment' else None
+    } for tp in partitions], complete
+
+def export_window(topics, start_ms, end_ms, options):
+    """导出时间窗口内的消息到 options.output_dir，返回是否全部导出完成"""
+    print(f"\n📤 导出 {', '.join(topics)}: {format_time(start_ms)} ~ {format_time(end_ms)}")
+    try:
+        lookup = create_consumer('replay-lookup', options.bootstrap, group_id=None, enable_auto_commit=False)
+        try:
+            ranges = resolve_offsets(lookup, topics, start_ms, end_ms)
+        finally:
+            lookup.close()
+    except Exception as e:
+        print(f"❌ 查找offset范围失败: {str(e)}")
+        return False
+
+    total = sum(end - start for start, end in ranges.values())
+    print(f"  {'topic':<20} {'分区':>4} {'起始offset':>12} {'结束offset':>12} {'消息数':>10}")
+    for tp, (start, end) in sorted(ranges.items()):
+        print(f"  {tp.topic:<20} {tp.partition:>6} {start:>14} {end:>14} {end - start:>11}")
+    print(f"  合计 {total} 条消息 (按offset范围估算)")
+
+    os.makedirs(options.output_dir, exist_ok=True)
+    assignments = assign_workers(ranges, options.workers)
+    print(f"  {len(assignments)} 个线程并行读取，格式: {options.format}"
+          + (f" ({options.compression})" if options.format == 'ndjson' else ""))
+
+    progress = Progress()
+    stop = threading.Event()
+    entries = []
+    complete = True
+    next_report = PROGRESS_INTERVAL_S
+    with ThreadPoolExecutor(max_workers=max(len(assignments), 1), thread_name_prefix='export') as executor:
+        futures = [executor.submit(export_worker, i, partitions, ranges, options, progress, stop)
+                   for i, partitions in enumerate(assignments)]
+        try:
+            while not all(future.done() for future in futures):
+                time.sleep(0.2)
+                if time.monotonic() - progress.started >= next_report:
+                    next_report += PROGRESS_INTERVAL_S
+                    progress.report('已导出', total)
+        except KeyboardInterrupt:
+            print("\n⚠️ 中断导出，保存已读取的部分...")
+            stop.set()
+
+        for future in futures:
+            try:
+                worker_entries, worker_complete = future.result()
+                entries.extend(worker_entries)
+                complete = complete and worker_complete
+            except Exception as e:
+                print(f"❌ 导出线程失败: {str(e)}")
+                complete = False
+
+    # 没有消息的分区也记录在manifest中，便于确认查找结果
+    exported = {(entry['topic'], entry['partition']) for entry in entries}
+    for tp, (start, end) in ranges.items():
+        if (tp.topic, tp.partition) not in exported:
+            entries.append({'topic': tp.topic, 'partition': tp.partition, 'start_offset': start,
+                            'end_offset': end, 'records': 0, 'bytes': 0, 'complete': True,
+                            'file': None, 'index': None})
+
+    manifest = {
+        'format': options.format,
+        'compression': options.compression if options.format == 'ndjson' else None,
+        'start_ms': start_ms,
+        'end_ms': end_ms,
+        'exported_at': int(time.time() * 1000),
+        'complete': complete and not stop.is_set(),
+        'partitions': sorted(entries, key=lambda entry: (entry['topic'], entry['partition']))
+    }
+    with open(os.path.join(options.output_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    progress.report('导出完成', total)
+    print(f"💾 导出目录: {options.output_dir} ({MANIFEST_FILE})")
+    if not manifest['complete']:
+        print("⚠️ 部分分区没有导出完整，见manifest中 complete=false 的分区")
+    return manifest['complete']
+
+def load_manifest(export_dir):
+    with open(os.path.join(export_dir, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+def replay_export(export_dir, topic_map, rate=0.0, start_ms=None, end_ms=None, keep_partitions=True,
+                  keep_timestamps=False, bootstrap=None, assume_yes=False):
+    """
+    按时间戳顺序合并各分区的导出记录并重新写入Kafka。
+    rate 为每秒消息数 (0为不限速)；keep_partitions 时写入原分区号 (目标topic分区不足时按key分区)
+    """
+    manifest = load_manifest(export_dir)
+    entries = [entry for entry in manifest['partitions'] if entry['file']]
+    topics = sorted({entry['topic'] for entry in entries})
+    targets = {topic: topic_map.get(topic, topic) for topic in topics}
+    total = sum(entry['records'] for entry in entries)
+    # 只重放其中一段时, 事先不知道消息数
+    expected = total if start_ms is None and end_ms is None else None
+
+    print(f"\n🔁 重放 {export_dir}: {total} 条消息 "
+          f"({format_time(manifest['start_ms'])} ~ {format_time(manifest['end_ms'])})")
+    for topic, target in targets.items():
+        print(f"  {topic} -> {target}")
+    print(f"  速率: {f'{rate:g} 条/s' if rate else '不限速'}")
+
+    if any(topic == target for topic, target in targets.items()) and not assume_yes:
+        confirm = input("⚠️ 将写回原topic，bridge会再次处理这些消息。确定继续? (yes/N): ").strip().lower()
+        if confirm != 'yes':
+            print("取消重放")
+            return True
+
+    try:
+        producer = create_producer(
+            'replay-producer', warm_topics=list(set(targets.values())), bootstrap_servers=bootstrap,
+            acks='all', linger_ms=20, batch_size=256 * 1024
+        )
+    except Exception as e:
+        print(f"❌ 创建生产者失败: {str(e)}")
+        return False
+    target_partitions = {target: producer.partitions_for(target) or set() for target in set(targets.values())}
+
+    progress = Progress()
+    failures = []
+
+    def on_error(error):
+        failures.append(error)
+
+    streams = [iter_partition(export_dir, manifest, entry, start_ms, end_ms) for entry in entries]
+    next_report = PROGRESS_INTERVAL_S
+    try:
+        for sent, record in enumerate(heapq.merge(*streams, key=lambda record: record.timestamp)):
+            if rate:
+                delay = progress.started + sent / rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+            target = targets[record.topic]
+            partition = record.partition if keep_partitions and record.partition in target_partitions[target] else None
+            producer.send(
+                target, value=record.value, key=record.key, headers=record.headers or None, partition=partition,
+                timestamp_ms=record.timestamp if keep_timestamps else None
+            ).add_errback(on_error)
+            progress.add(1, len(record.value or b''))
+
+            if time.monotonic() - progress.started >= next_report:
+                next_report += PROGRESS_INTERVAL_S
+                progress.report('已重放', expected)
+    except KeyboardInterrupt:
+        print("\n⚠️ 中断重放")
+    finally:
+        producer.flush()
+        producer.close()
+
+    progress.report('重放完成', expected)
+    if failures:
+        print(f"❌ {len(failures)} 条消息写入失败，例如: {failures[0]}")
+        return False
+    return True
+
+def parse_topic_map(items):
+    topic_map = {}
+    for item in items:
+        source, sep, target = item.partition('=')
+        if not sep or not source or not target:
+            raise argparse.ArgumentTypeError(f"--topic-map 格式应为 源topic=目标topic: {item}")
+        topic_map[source] = target
+    return topic_map
+
+def main():
+    parser = argparse.ArgumentParser(description='Kafka时间窗口导出/重放工具')
+    parser.add_argument('action', choices=['export', 'replay'],
+                        help='操作类型: export(导出时间窗口内的消息), replay(重放导出的消息)')
+    parser.add_argument('--topic', action='append', help=f'export的topic (可重复，默认: {", ".join(REQUIRED_TOPICS)})')
+    parser.add_argument('--start', help='时间窗口开始 (export时必需)，如 -30m、2024-06-12T08:00:00Z、毫秒时间戳')
+    parser.add_argument('--end', help='时间窗口结束，不包含 (export默认: now；replay时用于只重放其中一段)')
+    parser.add_argument('--output-dir', help='export的输出目录 (export时必需)')
+    parser.add_argument('--format', choices=FORMATS, default='ndjson', help='export文件格式 (默认: ndjson)')
+    parser.add_argument('--compression', choices=['gzip', 'none'], default='gzip', help='ndjson的压缩方式 (默认: gzip)')
+    parser.add_argument('--level', type=int, default=1, help='gzip压缩级别 (默认: 1)')
+    parser.add_argument('--index-interval', type=int, default=1000, help='segment每多少条记录写一个索引项 (默认: 1000)')
+    parser.add_argument('--workers', type=int, default=8, help='export的并行读取线程数 (默认: 8)')
+    parser.add_argument('--idle-timeout', type=float, default=30, help='export时多久读不到数据就放弃(秒) (默认: 30)')
+    parser.add_argument('--input-dir', help='replay的导出目录 (replay时必需)')
+    parser.add_argument('--topic-map', action='append', default=[], metavar='源topic=目标topic',
+                        help='replay时把消息写入其他topic (可重复，默认写回原topic)')
+    parser.add_argument('--rate', type=float, default=0, help='replay的速率 (消息/秒，默认不限速)')
+    parser.add_argument('--no-keep-partitions', action='store_true', help='replay时不保留原分区号，按key分区')
+    parser.add_argument('--keep-timestamps', action='store_true',
+                        help='replay时保留原消息时间戳 (注意: 早于retention的消息可能很快被删除)')
+    parser.add_argument('--yes', action='store_true', help='replay写回原topic时不再确认')
+    parser.add_argument('--bootstrap', help='改为以明文连接该地址的本地测试broker (如 localhost:9092)')
+    parser.add_argument('--profile', action='store_true', help='结束时打印连接建立与实际工作的耗时')
+
+    args = parser.parse_args()
+
+    print("🚀 Kafka时间窗口导出/重放工具")
+    print(f"连接到: {args.bootstrap or KAFKA_BROKERS}")
+    print("=" * 50)
+
+    try:
+        start_ms = parse_time(args.start) if args.start else None
+        end_ms = parse_time(args.end) if args.end else None
+        topic_map = parse_topic_map(args.topic_map)
+    except (ValueError, argparse.ArgumentTypeError) as e:
+        print(f"❌ 参数错误: {str(e)}")
+        sys.exit(1)
+
+    if args.action == 'export':
+        if start_ms is None or not args.output_dir:
+            print("❌ export需要指定 --start 和 --output-dir 参数")
+            sys.exit(1)
+        end_ms = end_ms if end_ms is not None else int(time.time() * 1000)
+        if end_ms <= start_ms:
+            print("❌ --end 必须晚于 --start")
+            sys.exit(1)
+        if not export_window(args.topic or REQUIRED_TOPICS, start_ms, end_ms, args):
+            sys.exit(1)
+
+    elif args.action == 'replay':
+        if not args.input_dir:
+            print("❌ replay需要指定 --input-dir 参数")
+            sys.exit(1)
+        if not replay_export(args.input_dir, topic_map, args.rate, start_ms, end_ms, not args.no_keep_partitions,
+                             args.keep_timestamps, args.bootstrap, args.yes):
+            sys.exit(1)
+
+    if args.profile:
+        PROFILER.report()
+
+if __name__ == "__main__":
+    main()